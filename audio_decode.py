@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+In-memory audio decoding
+Parses PCM WAV uploads straight from bytes, FLAC and Ogg Opus through libsndfile when soundfile is installed;
+other formats are piped through ffmpeg without touching disk
+"""
+
+import io
+import shutil
+import struct
+import subprocess
+import numpy as np
+from typing import Dict, Optional
+
+try:
+    import soundfile  # optional: decodes FLAC and Opus uploads in-process instead of spawning ffmpeg
+except ImportError:
+    soundfile = None
+
+SAMPLE_RATE = 16000
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+class AudioDecodeError(ValueError):
+    """Raised when uploaded bytes cannot be decoded as audio"""
+
+def pcm_to_float32(raw: bytes, format_tag: int, bits: int) -> Optional[np.ndarray]:
+    """Convert interleaved PCM sample bytes to float32 in [-1, 1]"""
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+        return np.frombuffer(raw, dtype="<f4").astype(np.float32)
+    if format_tag != WAVE_FORMAT_PCM:
+        return None
+
+    if bits == 16:
+        return np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    if bits == 32:
+        return np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    if bits == 8:
+        return (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    if bits == 24:
+        packed = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        samples = (packed[:, 0].astype(np.int32)
+                   | (packed[:, 1].astype(np.int32) << 8)
+                   | (packed[:, 2].astype(np.int32) << 16))
+        samples = np.where(samples & 0x800000, samples - 0x1000000, samples)
+        return samples.astype(np.float32) / 8388608.0
+    return None
+
+def parse_wav(data: bytes) -> Optional[np.ndarray]:
+    """Decode a 16 kHz PCM/float WAV to mono float32; returns None if it needs ffmpeg"""
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        chunk_size = struct.unpack("<I", data[offset + 4:offset + 8])[0]
+        body = offset + 8
+
+        if chunk_id == b"fmt " and chunk_size >= 16:
+            if body + min(chunk_size, 26) > len(data):
+                return None  # truncated header
+            format_tag, channels, rate, _, block_align, bits = struct.unpack("<HHIIHH", data[body:body + 16])
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 26:
+                # The real format tag is the first two bytes of the SubFormat GUID
+                format_tag = struct.unpack("<H", data[body + 24:body + 26])[0]
+            fmt = (format_tag, channels, rate, block_align, bits)
+
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            format_tag, channels, rate, block_align, bits = fmt
+            if rate != SAMPLE_RATE or channels < 1 or bits % 8 or block_align == 0 or block_align != channels * (bits // 8):
+                return None
+
+            # Recorders killed mid-write (or writing to a pipe) leave a bogus size; trust the bytes we have
+            end = min(body + chunk_size, len(data))
+            end -= (end - body) % block_align
+            samples = pcm_to_float32(data[body:end], format_tag, bits)
+            if samples is None:
+                return None
+            if channels > 1:
+                samples = samples.reshape(-1, channels).mean(axis=1)
+            return np.ascontiguousarray(samples, dtype=np.float32)
+
+        offset = body + chunk_size + (chunk_size & 1)
+
+    return None
+
+def sniff_codec(data: bytes) -> Optional[str]:
+    """Upload codec recognized from the leading bytes: wav, flac or opus (None for anything else)"""
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return "wav"
+    if data[:4] == b"fLaC":
+        return "flac"
+    # An Ogg stream's first page carries the codec's identification header
+    if data[:4] == b"OggS" and b"OpusHead" in data[:64]:
+        return "opus"
+    return None
+
+def decimate(samples: np.ndarray, factor: int, taps_per_phase: int = 16) -> np.ndarray:
+    """Downsample by an integer factor behind a windowed-sinc low-pass filter"""
+    n = np.arange(-taps_per_phase * factor, taps_per_phase * factor + 1)
+    cutoff = 0.9 / factor  # of the Nyquist frequency, leaving room for the filter's transition band
+    taps = cutoff * np.sinc(cutoff * n) * np.hamming(len(n))
+    return np.convolve(samples, taps / taps.sum(), mode="same")[::factor].astype(np.float32)
+
+def decode_with_soundfile(data: bytes) -> Optional[np.ndarray]:
+    """Decode FLAC / Ogg Opus bytes with libsndfile; returns None if it needs ffmpeg"""
+    try:
+        samples, rate = soundfile.read(io.BytesIO(data), dtype="float32", always_2d=True)
+    except RuntimeError:
+        return None  # libsndfile built without the codec, or a stream it can't parse
+    samples = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    if rate == SAMPLE_RATE:
+        return np.ascontiguousarray(samples, dtype=np.float32)
+    # Opus always decodes at 48 kHz
+    if rate % SAMPLE_RATE == 0:
+        return decimate(samples, rate // SAMPLE_RATE)
+    return None
+
+def supported_codecs() -> Dict[str, str]:
+    """Upload codecs this server can decode -> how: 'native' or 'soundfile' in memory, or an 'ffmpeg' pipe"""
+    codecs = {"wav": "native"}
+    has_ffmpeg = shutil.which("ffmpeg") is not None
+    for codec, container, subtype in (("flac", "FLAC", "PCM_16"), ("opus", "OGG", "OPUS")):
+        if soundfile is not None and subtype in soundfile.available_subtypes(container):
+            codecs[codec] = "soundfile"
+        elif has_ffmpeg:
+            codecs[codec] = "ffmpeg"
+    return codecs
+
+def decode_with_ffmpeg(data: bytes, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode any ffmpeg-readable format through stdin/stdout pipes"""
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sr),
+        "pipe:1"
+    ]
+    try:
+        out = subprocess.run(cmd, input=data, capture_output=True, check=True).stdout
+    except FileNotFoundError:
+        raise AudioDecodeError("ffmpeg is not installed")
+    except subprocess.CalledProcessError as e:
+        raise AudioDecodeError(f"Failed to decode audio: {e.stderr.decode(errors='replace').strip()[-300:]}")
+
+    return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+
+def decode_audio(data: bytes) -> np.ndarray:
+    """Decode uploaded bytes to a 16 kHz mono float32 array"""
+    if not data:
+        raise AudioDecodeError("Empty audio upload")
+
+    audio = parse_wav(data)
+    if audio is None and soundfile is not None and sniff_codec(data) in ("flac", "opus"):
+        audio = decode_with_soundfile(data)
+    if audio is None:
+        audio = decode_with_ffmpeg(data)
+    return audio
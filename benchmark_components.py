@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Component micro-benchmarks for the transcription hot paths
+Times each stage in isolation, stores one JSON file per run and compares it with the previous run to flag regressions
+"""
+
+import argparse
+import datetime
+import glob
+import json
+import os
+import platform
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import torch
+import whisper
+from fastapi.responses import JSONResponse
+
+from audio_decode import decode_audio
+from benchmark_load import encode_wav, synthesize_clip
+from client_simple import SimpleVoiceClient
+from client_simple_toggle import SimpleToggleClient
+from cpu_inference import configure_threads, quantize_int8
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_results")
+
+def measure(fn: Callable[[], Any], repeat: int, warmup: int) -> Dict[str, float]:
+    """Run fn warmup + repeat times; milliseconds statistics over the measured runs"""
+    for _ in range(warmup):
+        fn()
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - started) * 1000)
+    return {
+        "runs": repeat,
+        "median_ms": round(statistics.median(durations), 4),
+        "mean_ms": round(statistics.mean(durations), 4),
+        "min_ms": round(min(durations), 4),
+        "p95_ms": round(float(np.percentile(durations, 95)), 4),
+    }
+
+def sample_response(segments: int = 30) -> Dict[str, Any]:
+    """Fixed full-detail /transcribe body (30 s of speech) so serialization cost is comparable between runs"""
+    return {
+        "text": " ".join(f"Segment number {i} of the benchmark transcription." for i in range(segments)),
+        "language": "en",
+        "model": "tiny",
+        "segments": [{
+            "id": i,
+            "seek": 0,
+            "start": round(i * 1.0, 2),
+            "end": round(i * 1.0 + 0.96, 2),
+            "text": f" Segment number {i} of the benchmark transcription.",
+            "tokens": list(range(50365 + i, 50365 + i + 12)),
+            "temperature": 0.0,
+            "avg_logprob": -0.2134,
+            "compression_ratio": 1.4521,
+            "no_speech_prob": 0.0123
+        } for i in range(segments)],
+        "speech_ratio": 0.93
+    }
+
+def bench_model(model: whisper.Whisper, audio: np.ndarray, repeat: int, warmup: int) -> Dict[str, Dict[str, float]]:
+    """log-mel, one encoder forward and one decoder step (logits for the start-of-transcript prompt)"""
+    results = {}
+    padded = whisper.pad_or_trim(audio)
+    results["log_mel"] = measure(
+        lambda: whisper.log_mel_spectrogram(padded, model.dims.n_mels, device=model.device), repeat, warmup
+    )
+
+    with torch.no_grad():
+        mel = whisper.log_mel_spectrogram(padded, model.dims.n_mels, device=model.device)[None]
+        results["encoder_forward"] = measure(lambda: model.embed_audio(mel), repeat, warmup)
+
+        audio_features = model.embed_audio(mel)
+        tokenizer = whisper.tokenizer.get_tokenizer(
+            model.is_multilingual, num_languages=model.num_languages, language="en", task="transcribe"
+        )
+        tokens = torch.tensor([list(tokenizer.sot_sequence)], device=model.device)
+        results["decode_step"] = measure(lambda: model.logits(tokens, audio_features), repeat, warmup)
+    return results
+
+def bench_save_transcription(directory: str, repeat: int, warmup: int) -> Dict[str, float]:
+    """The clients' APSW insert path: open the database, insert one row, close"""
+    client = SimpleVoiceClient(db_path=os.path.join(directory, "transcriptions.db"))
+    text = sample_response()["text"][:400]
+    return measure(lambda: client.save_transcription(text, "en", 5, "benchmark"), repeat, warmup)
+
+def bench_socket_round_trip(directory: str, repeat: int, warmup: int) -> Dict[str, float]:
+    """A trigger.py-style 'status' command against the toggle client's Unix socket listener"""
+    handlers = {sig: signal.getsignal(sig) for sig in (signal.SIGINT, signal.SIGTERM)}
+    client = SimpleToggleClient(db_path=os.path.join(directory, "toggle.db"))
+    for sig, handler in handlers.items():
+        signal.signal(sig, handler)  # the client installs its own exit-on-signal handlers
+    # Private socket path, so a toggle client running on this machine is left alone
+    client.socket_path = os.path.join(directory, "voice_client.sock")
+    client.setup_socket_listener()
+
+    def round_trip():
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(client.socket_path)
+        sock.send(b"status")
+        sock.recv(1024)
+        sock.close()
+
+    try:
+        return measure(round_trip, repeat, warmup)
+    finally:
+        client.running = False
+        client.cleanup_socket()
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def previous_run(environment: Dict[str, Any], current_path: str) -> Optional[Dict[str, Any]]:
+    """Most recent stored run measured on the same model, device, mode and thread count"""
+    for path in sorted(glob.glob(os.path.join(RESULTS_DIR, "components-*.json")), reverse=True):
+        if os.path.abspath(path) == os.path.abspath(current_path):
+            continue
+        try:
+            with open(path) as f:
+                run = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if run.get("environment") == environment:
+            run["path"] = path
+            return run
+    return None
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Print a per-component comparison of median times; returns the components that regressed"""
+    regressions = []
+    print(f"\n📊 Compared with {baseline['commit'] or 'unknown'} ({baseline['timestamp']}):", file=sys.stderr)
+    for name, stats in current["components"].items():
+        before = baseline["components"].get(name)
+        if before is None:
+            print(f"   {name:<22} {stats['median_ms']:>10.3f} ms  (new)", file=sys.stderr)
+            continue
+        change = stats["median_ms"] / before["median_ms"] - 1 if before["median_ms"] else 0.0
+        # Sub-10 µs differences are timer noise, whatever the ratio says
+        regressed = change > threshold and stats["median_ms"] - before["median_ms"] > 0.01
+        marker = "❌" if regressed else "✅"
+        print(f"   {marker} {name:<20} {before['median_ms']:>10.3f} → {stats['median_ms']:>10.3f} ms  ({change:+.1%})",
+              file=sys.stderr)
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark the transcription hot paths")
+    parser.add_argument("--model", default="tiny", help="Whisper model for the mel/encoder/decoder benchmarks (default: tiny)")
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--cpu-mode", choices=("int8", "fp32"), default=os.getenv("VTT_CPU_MODE", "int8"),
+                        help="Same meaning as the server's VTT_CPU_MODE (default: int8)")
+    parser.add_argument("--threads", type=int, help="Torch intra-op threads on CPU (default: all available cores)")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Length of the synthetic clip (default: 10)")
+    parser.add_argument("--repeat", type=int, default=20, help="Measured runs per component (default: 20)")
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured runs per component (default: 3)")
+    parser.add_argument("--only", help="Comma-separated subset of components to run")
+    parser.add_argument("--baseline", help="Compare with this result file instead of the previous matching run")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Slowdown reported as a regression (default: 0.10)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 when a component regressed")
+    parser.add_argument("--no-save", action="store_true", help="Don't store this run in benchmark_results/")
+    args = parser.parse_args()
+
+    only = set(args.only.split(",")) if args.only else None
+
+    def wanted(name: str) -> bool:
+        return only is None or name in only
+
+    threads = configure_threads(args.threads) if args.device == "cpu" else None
+    audio_int16 = synthesize_clip(args.seconds, 0)
+    wav = encode_wav(audio_int16, None)
+    audio = decode_audio(wav)
+    components: Dict[str, Dict[str, float]] = {}
+
+    if wanted("wav_parse"):
+        components["wav_parse"] = measure(lambda: decode_audio(wav), args.repeat, args.warmup)
+
+    if any(wanted(name) for name in ("log_mel", "encoder_forward", "decode_step")):
+        print(f"📥 Loading {args.model} on {args.device}...", file=sys.stderr)
+        model = whisper.load_model(args.model, device=args.device)
+        if args.device == "cpu" and args.cpu_mode == "int8":
+            model = quantize_int8(model)
+        model_results = bench_model(model, audio, args.repeat, args.warmup)
+        components.update({name: stats for name, stats in model_results.items() if wanted(name)})
+
+    if wanted("json_serialization"):
+        body = sample_response()
+        components["json_serialization"] = measure(lambda: JSONResponse(body).body, args.repeat * 10, args.warmup)
+
+    with tempfile.TemporaryDirectory() as directory:
+        if wanted("save_transcription"):
+            components["save_transcription"] = bench_save_transcription(directory, args.repeat * 5, args.warmup)
+        if wanted("socket_round_trip"):
+            components["socket_round_trip"] = bench_socket_round_trip(directory, args.repeat * 5, args.warmup)
+
+    run = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        # Runs are only compared with earlier runs in an identical environment
+        "environment": {
+            "model": args.model,
+            "device": args.device,
+            "cpu_mode": args.cpu_mode if args.device == "cpu" else None,
+            "threads": threads["intra_op_threads"] if threads else None,
+            "clip_seconds": args.seconds,
+            "machine": platform.machine(),
+            "torch": torch.__version__,
+        },
+        "components": components
+    }
+
+    for name, stats in components.items():
+        print(f"   {name:<22} median {stats['median_ms']:>10.3f} ms   p95 {stats['p95_ms']:>10.3f} ms", file=sys.stderr)
+
+    path = os.path.join(RESULTS_DIR, f"components-{run['timestamp'].replace(':', '')}-{run['commit'] or 'nogit'}.json")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    else:
+        baseline = previous_run(run["environment"], path)
+
+    regressions = compare(run, baseline, args.threshold) if baseline else []
+    if baseline is None:
+        print("\nℹ️  No earlier run with the same environment to compare with", file=sys.stderr)
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"💾 Saved {path}", file=sys.stderr)
+
+    if regressions:
+        print(f"❌ Regressed: {', '.join(regressions)}", file=sys.stderr)
+        if args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Load-generation benchmark for the transcription server
+Replays a WAV corpus (or synthesized speech-like audio) against /transcribe and reports throughput and tail latency as JSON
+"""
+
+import argparse
+import datetime
+import glob
+import io
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+SAMPLE_RATE = 16000
+
+class Clip:
+    def __init__(self, name: str, samples: np.ndarray):
+        self.name = name
+        self.samples = samples  # int16 mono
+        self.duration = len(samples) / SAMPLE_RATE
+
+def synthesize_clip(seconds: float, seed: int) -> np.ndarray:
+    """Speech-like test signal: voiced 'syllables' with a wandering pitch, separated by short pauses"""
+    rng = np.random.RandomState(seed)
+    audio = np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+    position = int(0.2 * SAMPLE_RATE)
+    while position < len(audio):
+        length = int(rng.uniform(0.15, 0.4) * SAMPLE_RATE)
+        t = np.arange(min(length, len(audio) - position)) / SAMPLE_RATE
+        pitch = rng.uniform(110, 220)
+        envelope = np.sin(np.pi * t / max(t[-1], 1e-3)) if len(t) else t
+        voiced = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+        audio[position:position + len(t)] = 0.2 * envelope * voiced
+        position += length + int(rng.uniform(0.05, 0.5) * SAMPLE_RATE)
+    audio += 0.002 * rng.randn(len(audio)).astype(np.float32)
+    return (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+
+def load_corpus(directory: Optional[str], synthetic: List[float]) -> List[Clip]:
+    """16 kHz mono 16-bit WAVs from a directory, or synthetic clips of the given lengths"""
+    if not directory:
+        return [Clip(f"synthetic-{seconds:g}s", synthesize_clip(seconds, i)) for i, seconds in enumerate(synthetic)]
+
+    clips = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.wav"))):
+        try:
+            with wave.open(path, "rb") as wav:
+                if wav.getframerate() != SAMPLE_RATE or wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+                    print(f"⚠️  Skipping {path}: not 16 kHz mono 16-bit PCM", file=sys.stderr)
+                    continue
+                clips.append(Clip(os.path.basename(path), np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2")))
+        except (wave.Error, EOFError) as e:
+            print(f"⚠️  Skipping {path}: {e}", file=sys.stderr)
+    return clips
+
+def encode_wav(samples: np.ndarray, nonce: Optional[int]) -> bytes:
+    """WAV bytes for a clip; a nonce adds ±1 LSB of dither so the server's result cache can't serve repeats"""
+    if nonce is not None:
+        dither = np.random.RandomState(nonce).randint(-1, 2, len(samples))
+        samples = np.clip(samples.astype(np.int32) + dither, -32768, 32767).astype(np.int16)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples.astype("<i2").tobytes())
+    return buffer.getvalue()
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """Stage durations in milliseconds from a Server-Timing header"""
+    stages = {}
+    for entry in header.split(","):
+        name, _, duration = entry.strip().partition(";dur=")
+        try:
+            stages[name] = float(duration)
+        except ValueError:
+            pass
+    return stages
+
+class LoadRunner:
+    def __init__(self, args: argparse.Namespace, clips: List[Clip]):
+        self.args = args
+        self.clips = clips
+        self.session = requests.Session()
+        self.lock = threading.Lock()
+        self.samples: List[Dict[str, Any]] = []
+        self.sent = 0
+
+    def next_payload(self, index: Optional[int] = None) -> Tuple[Clip, bytes]:
+        with self.lock:
+            sequence = self.sent
+            self.sent += 1
+        clip = self.clips[(sequence if index is None else index) % len(self.clips)]
+        return clip, encode_wav(clip.samples, sequence if self.args.unique else None)
+
+    def send(self, clip: Clip, payload: bytes, record: bool = True, scheduled: Optional[float] = None):
+        """POST one clip and record its latency, status and server-side stage timings"""
+        params = {"fields": "text"}
+        if self.args.model:
+            params["model"] = self.args.model
+        # Open-loop arrivals count latency from when they were due, so a late send isn't hidden (coordinated omission)
+        sent = time.perf_counter()
+        started = sent if scheduled is None else scheduled
+        status, error, stages = 0, None, {}
+        try:
+            response = self.session.post(
+                f"{self.args.url}/transcribe",
+                files={"audio": ("audio.wav", payload, "audio/wav")},
+                params=params,
+                timeout=self.args.timeout
+            )
+            status = response.status_code
+            stages = parse_server_timing(response.headers.get("Server-Timing", ""))
+            if status != 200:
+                error = response.text[:200]
+        except requests.exceptions.RequestException as e:
+            error = str(e)
+        latency = time.perf_counter() - started
+
+        if record:
+            with self.lock:
+                self.samples.append({
+                    "clip": clip.name,
+                    "audio_seconds": clip.duration,
+                    "latency": latency,
+                    "send_lag": sent - started,
+                    "status": status,
+                    "error": error,
+                    "stages": stages
+                })
+
+    def warm_up(self):
+        for _ in range(self.args.warmup):
+            self.send(*self.next_payload(), record=False)
+
+    def run(self) -> float:
+        """Drive the configured arrival pattern; returns the wall time of the measured phase"""
+        pattern = self.args.pattern
+        closed = pattern == "steady" and not self.args.rate
+        # Open-loop patterns get a thread per request, so every arrival is sent when it is due however many are outstanding
+        workers = self.args.concurrency if closed else self.args.requests
+        self.session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=workers))
+        self.session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=workers))
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            if closed:
+                # Closed loop: every worker sends its next request as soon as the previous one returns
+                per_worker = math.ceil(self.args.requests / self.args.concurrency)
+                for _ in range(self.args.concurrency):
+                    pool.submit(self.closed_loop, per_worker)
+            elif pattern == "steady":
+                # Open loop at a fixed arrival rate, whether or not the server keeps up
+                for i in range(self.args.requests):
+                    due = started + i / self.args.rate
+                    self.sleep_until(due)
+                    pool.submit(self.send, *self.next_payload(), scheduled=due)
+            elif pattern == "bursty":
+                bursts = math.ceil(self.args.requests / self.args.burst_size)
+                for burst in range(bursts):
+                    due = started + burst * self.args.burst_interval
+                    self.sleep_until(due)
+                    for _ in range(min(self.args.burst_size, self.args.requests - burst * self.args.burst_size)):
+                        pool.submit(self.send, *self.next_payload(), scheduled=due)
+            else:
+                # Like client_streaming.py: each client records a chunk, sends it, and records the next meanwhile
+                rounds = math.ceil(self.args.requests / self.args.concurrency)
+                offsets = [i * self.args.cadence / self.args.concurrency for i in range(self.args.concurrency)]
+                for n in range(rounds):
+                    for client, offset in enumerate(offsets):
+                        if n * self.args.concurrency + client >= self.args.requests:
+                            break
+                        due = started + offset + n * self.args.cadence
+                        self.sleep_until(due)
+                        pool.submit(self.send, *self.next_payload(client), scheduled=due)
+        return time.perf_counter() - started
+
+    def closed_loop(self, count: int):
+        for _ in range(count):
+            with self.lock:
+                if self.sent - self.args.warmup >= self.args.requests:
+                    return
+            self.send(*self.next_payload())
+
+    @staticmethod
+    def sleep_until(deadline: float):
+        remaining = deadline - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    return round(float(np.percentile(values, q)), 4) if values else None
+
+def summarize(args: argparse.Namespace, samples: List[Dict[str, Any]], wall: float) -> Dict[str, Any]:
+    """Throughput, latency percentiles, real-time factor and error rate for one run"""
+    ok = [s for s in samples if s["status"] == 200]
+    latencies = [s["latency"] for s in ok]
+    audio_seconds = sum(s["audio_seconds"] for s in ok)
+    statuses: Dict[str, int] = {}
+    for s in samples:
+        statuses[str(s["status"])] = statuses.get(str(s["status"]), 0) + 1
+
+    stage_totals: Dict[str, List[float]] = {}
+    for s in ok:
+        for stage, ms in s["stages"].items():
+            stage_totals.setdefault(stage, []).append(ms)
+
+    return {
+        "requests": len(samples),
+        "succeeded": len(ok),
+        "error_rate": round(1 - len(ok) / len(samples), 4) if samples else None,
+        "status_counts": statuses,
+        "wall_seconds": round(wall, 3),
+        "requests_per_second": round(len(ok) / wall, 3) if wall else None,
+        "latency_seconds": {
+            "mean": round(float(np.mean(latencies)), 4) if latencies else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": round(max(latencies), 4) if latencies else None,
+        },
+        # How late the benchmark itself sent a request after it was due; should stay near 0, or the client is the bottleneck
+        "max_send_lag_seconds": round(max(s["send_lag"] for s in samples), 4) if samples else None,
+        # Per request: latency / audio duration (below 1 means faster than real time)
+        "real_time_factor": {
+            "mean": round(float(np.mean([s["latency"] / s["audio_seconds"] for s in ok])), 4) if ok else None,
+            "p95": percentile([s["latency"] / s["audio_seconds"] for s in ok], 95),
+        },
+        # Aggregate: seconds of audio transcribed per wall-clock second
+        "audio_seconds_per_second": round(audio_seconds / wall, 3) if wall else None,
+        "server_stage_ms_mean": {stage: round(float(np.mean(ms)), 2) for stage, ms in stage_totals.items()},
+        "errors": sorted({s["error"] for s in samples if s["error"]})[:10]
+    }
+
+def run_metadata(args: argparse.Namespace, clips: List[Clip]) -> Dict[str, Any]:
+    """Everything needed to compare this run with another one"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    try:
+        server = requests.get(f"{args.url}/model-info", timeout=5).json()
+        server = {key: server.get(key) for key in ("device", "model_size", "process_backend")}
+    except (requests.exceptions.RequestException, ValueError):
+        server = None
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "url": args.url,
+        "model": args.model,
+        "server": server,
+        "pattern": args.pattern,
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "burst_size": args.burst_size if args.pattern == "bursty" else None,
+        "burst_interval": args.burst_interval if args.pattern == "bursty" else None,
+        "cadence": args.cadence if args.pattern == "streaming" else None,
+        "corpus": args.corpus or "synthetic",
+        "clips": len(clips),
+        "corpus_audio_seconds": round(sum(clip.duration for clip in clips), 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay audio against /transcribe and report throughput and latency")
+    parser.add_argument("--url", default="http://localhost:8000", help="Server base URL")
+    parser.add_argument("--model", default="tiny", help="Whisper model to request (default: tiny); empty uses the server default")
+    parser.add_argument("--corpus", help="Directory of 16 kHz mono 16-bit WAV files (default: synthetic audio)")
+    parser.add_argument("--synthetic-seconds", default="3,5,8,12",
+                        help="Comma-separated clip lengths for the synthetic corpus (default: 3,5,8,12)")
+    parser.add_argument("--pattern", choices=("steady", "bursty", "streaming"), default="steady")
+    parser.add_argument("--requests", type=int, default=50, help="Measured requests (default: 50)")
+    parser.add_argument("--concurrency", type=int, default=4, help="steady closed loop: requests in flight; streaming: clients (default: 4)")
+    parser.add_argument("--rate", type=float, default=0.0, help="steady: arrivals per second; 0 runs closed loop (default)")
+    parser.add_argument("--burst-size", type=int, default=8, help="bursty: requests per burst (default: 8)")
+    parser.add_argument("--burst-interval", type=float, default=5.0, help="bursty: seconds between bursts (default: 5)")
+    parser.add_argument("--cadence", type=float, default=5.0, help="streaming: seconds between a client's chunks (default: 5)")
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests sent first (default: 2)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--no-unique", dest="unique", action="store_false",
+                        help="Send clips byte-identical on repeat (lets the server's result cache answer)")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    clips = load_corpus(args.corpus, [float(s) for s in args.synthetic_seconds.split(",") if s])
+    if not clips:
+        sys.exit("❌ No usable clips")
+    if args.pattern == "streaming" and not args.corpus:
+        # Streaming clients send fixed-length chunks
+        clips = [Clip(f"synthetic-{args.cadence:g}s", synthesize_clip(args.cadence, i)) for i in range(4)]
+
+    runner = LoadRunner(args, clips)
+    print(f"🔥 Warming up with {args.warmup} request(s)...", file=sys.stderr)
+    runner.warm_up()
+    print(f"🚀 {args.pattern}: {args.requests} requests, concurrency {args.concurrency}...", file=sys.stderr)
+    wall = runner.run()
+
+    report = {"run": run_metadata(args, clips), "results": summarize(args, runner.samples, wall)}
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(encoded + "\n")
+        print(f"💾 Report written to {args.output}", file=sys.stderr)
+    else:
+        print(encoded)
+
+if __name__ == "__main__":
+    main()
@@ -11,12 +11,22 @@ import os
 import time
 import apsw
 import datetime
+import socket
 from typing import Optional, List, Tuple
 
+from upload_codec import content_type, encode_file, negotiate_codec
+
 class SimpleVoiceClient:
-    def __init__(self, server_url: str = "http://localhost:8000", db_path: str = "transcriptions.db"):
+    def __init__(self, server_url: str = "http://localhost:8000", db_path: str = "transcriptions.db",
+                 decode_preset: str = "balanced"):
         self.server_url = server_url.rstrip('/')
         self.db_path = db_path
+        # Sent as X-Client-Id so the server schedules this client fairly against others
+        self.client_id = f"simple@{socket.gethostname()}"
+        # Sent as X-Decode-Preset: realtime, balanced or accurate
+        self.decode_preset = decode_preset
+        # Recordings are uploaded as WAV until wait_for_ready() agrees on VTT_UPLOAD_CODEC with the server
+        self.upload_codec = "wav"
         self.init_database()
     
     def init_database(self):
@@ -73,6 +83,19 @@ class SimpleVoiceClient:
             print(f"❌ Cannot connect to server: {e}")
             return False
     
+    def wait_for_ready(self, timeout: int = 60) -> bool:
+        """Block until the server has its model loaded and warmed up"""
+        try:
+            response = requests.get(f"{self.server_url}/ready", params={"wait": timeout}, timeout=timeout + 5)
+            if response.status_code == 200:
+                self.upload_codec = negotiate_codec(self.server_url)
+                return True
+            print(f"⏳ Server not ready yet ({response.json().get('stage', 'unknown')})")
+            return False
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Cannot connect to server: {e}")
+            return False
+    
     def record_audio_system(self, duration: int = 5) -> str:
         """Record audio using macOS system command"""
         temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
@@ -123,7 +146,7 @@ class SimpleVoiceClient:
                     os.rename(temp_file.name.replace('.wav', '.aiff'), temp_file.name)
         
         print("✅ Recording completed")
-        return temp_file.name
+        return encode_file(temp_file.name, self.upload_codec)
     
     def record_from_file(self, file_path: str) -> str:
         """Use an existing audio file for testing"""
@@ -132,17 +155,20 @@ class SimpleVoiceClient:
             return None
         return file_path
     
-    def transcribe_file(self, audio_file_path: str) -> Optional[str]:
+    def transcribe_file(self, audio_file_path: str, timeout: int = 30) -> Optional[str]:
         """Send audio file to server for transcription"""
         try:
             print("📤 Sending audio to server...")
             
             with open(audio_file_path, 'rb') as audio_file:
-                files = {'audio': ('audio.wav', audio_file, 'audio/wav')}
+                files = {'audio': (os.path.basename(audio_file_path), audio_file, content_type(audio_file_path))}
                 response = requests.post(
                     f"{self.server_url}/transcribe",
                     files=files,
-                    timeout=30
+                    params={'fields': 'text'},  # only text and language are used
+                    headers={'X-Priority': 'interactive', 'X-Client-Id': self.client_id,
+                             'X-Decode-Preset': self.decode_preset},
+                    timeout=timeout
                 )
             
             if response.status_code == 200:
@@ -159,12 +185,81 @@ class SimpleVoiceClient:
             print(f"❌ Network error: {e}")
             return None
     
+    def transcribe_files(self, audio_file_paths: List[str], timeout: int = 300) -> Optional[List[dict]]:
+        """Send several files in one batch request; returns one result (or error) per file, in order"""
+        handles = []
+        try:
+            print(f"📤 Sending {len(audio_file_paths)} files to server...")
+            handles = [open(path, 'rb') for path in audio_file_paths]
+            files = [('audio', (os.path.basename(path), handle, content_type(path)))
+                     for path, handle in zip(audio_file_paths, handles)]
+            response = requests.post(f"{self.server_url}/transcribe/batch", files=files, params={'fields': 'text'},
+                                     headers={'X-Priority': 'batch', 'X-Client-Id': self.client_id,
+                                              'X-Decode-Preset': self.decode_preset}, timeout=timeout)
+            
+            if response.status_code == 200:
+                return response.json()['results']
+            print(f"❌ Batch transcription failed: {response.status_code} - {response.text}")
+            return None
+        
+        except (OSError, requests.exceptions.RequestException) as e:
+            print(f"❌ Batch failed: {e}")
+            return None
+        finally:
+            for handle in handles:
+                handle.close()
+    
+    def transcribe_file_job(self, audio_file_path: str, poll_interval: float = 1.0) -> Optional[Tuple[str, str]]:
+        """Queue a file as a background job and poll until it finishes"""
+        job_id = None
+        try:
+            print("📤 Uploading audio as a job...")
+            
+            with open(audio_file_path, 'rb') as audio_file:
+                files = {'audio': (os.path.basename(audio_file_path), audio_file, content_type(audio_file_path))}
+                response = requests.post(f"{self.server_url}/jobs", files=files,
+                                         headers={'X-Client-Id': self.client_id, 'X-Decode-Preset': self.decode_preset},
+                                         timeout=60)
+            
+            if response.status_code != 202:
+                print(f"❌ Job submission failed: {response.status_code} - {response.text}")
+                return None
+            job_id = response.json()['id']
+            print(f"🆔 Job {job_id} queued (Ctrl+C cancels)")
+            
+            last_progress = None
+            while True:
+                time.sleep(poll_interval)
+                job = requests.get(f"{self.server_url}/jobs/{job_id}", params={'fields': 'text'}, timeout=10).json()
+                if job['status'] == 'completed':
+                    result = job['result']
+                    language = result.get('language', 'unknown')
+                    print(f"🌍 Detected language: {language}")
+                    return result.get('text', '').strip(), language
+                if job['status'] in ('failed', 'cancelled'):
+                    print(f"❌ Job {job['status']}: {job.get('error') or ''}")
+                    return None
+                progress = int(job['progress'] * 100)
+                if progress != last_progress:
+                    print(f"⏳ {job['status']} {progress}%")
+                    last_progress = progress
+                
+        except KeyboardInterrupt:
+            if job_id:
+                requests.delete(f"{self.server_url}/jobs/{job_id}", timeout=10)
+                print("🛑 Job cancelled")
+            return None
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Network error: {e}")
+            return None
+    
     def interactive_mode(self):
         """Interactive mode with simplified recording"""
         print("🎙️  Simple Voice-to-Text Client (macOS 10.15.7)")
         print("Commands:")
         print("  'r' = record audio")
         print("  'f' = transcribe file") 
+        print("  'b' = transcribe several files in one request")
         print("  'h' = view transcription history")
         print("  't' = test server")
         print("  'q' = quit")
@@ -202,7 +297,8 @@ class SimpleVoiceClient:
                     
             elif command == 'f':
                 file_path = input("Enter audio file path: ").strip()
-                result = self.transcribe_file(file_path)
+                # Files can be long; run them as a job instead of holding the request open
+                result = self.transcribe_file_job(file_path)
                 if result:
                     text, language = result
                     print(f"📝 Transcription: '{text}'")
@@ -210,6 +306,22 @@ class SimpleVoiceClient:
                     print("💾 Saved to database")
                 else:
                     print("❌ Transcription failed")
+            elif command == 'b':
+                paths = input("Enter audio file paths (space separated): ").split()
+                missing = [path for path in paths if not os.path.exists(path)]
+                if missing:
+                    print(f"❌ File not found: {', '.join(missing)}")
+                    continue
+                results = self.transcribe_files(paths) if paths else None
+                for path, result in zip(paths, results or []):
+                    if result['status'] == 200:
+                        text = result.get('text', '').strip()
+                        print(f"📝 {os.path.basename(path)}: '{text}'")
+                        self.save_transcription(text, result.get('language', 'unknown'), None, f"file:{os.path.basename(path)}")
+                    else:
+                        print(f"❌ {os.path.basename(path)}: {result['status']} - {result['error']}")
+                if results:
+                    print("💾 Saved to database")
             elif command == 'h':
                 print("\n📚 Recent Transcriptions:")
                 transcriptions = self.get_transcriptions()
@@ -219,7 +331,7 @@ class SimpleVoiceClient:
                     for i, (id, timestamp, text, language, duration, source) in enumerate(transcriptions[:10]):
                         print(f"{i+1}. [{timestamp}] ({language}) {source}: {text[:50]}{'...' if len(text) > 50 else ''}")
             else:
-                print("Unknown command. Use 'r', 'f', 'h', 't', or 'q'")
+                print("Unknown command. Use 'r', 'f', 'b', 'h', 't', or 'q'")
 
 def main():
     print("Simple Voice-to-Text Client for macOS 10.15.7")
@@ -238,6 +350,11 @@ def main():
         print("2. Run: cd voice_to_text_local && source venv/bin/activate && python server.py")
         return
     
+    print("⏳ Waiting for server model to be ready...")
+    if not client.wait_for_ready():
+        print("❌ Server model did not become ready")
+        return
+    
     client.interactive_mode()
     print("👋 Goodbye!")
 
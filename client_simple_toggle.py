@@ -6,6 +6,7 @@ Terminal-only, no permissions needed
 
 import subprocess
 import requests
+import json
 import tempfile
 import os
 import time
@@ -19,8 +20,11 @@ import socket
 import threading
 from typing import Optional, Tuple
 
+from upload_codec import content_type, ffmpeg_output_args, negotiate_codec, suffix
+
 class SimpleToggleClient:
-    def __init__(self, server_url: str = "http://100.107.71.56:8000", db_path: str = "transcriptions.db"):
+    def __init__(self, server_url: str = "http://100.107.71.56:8000", db_path: str = "transcriptions.db",
+                 decode_preset: str = "balanced"):
         self.server_url = server_url.rstrip('/')
         self.db_path = db_path
         self.is_recording = False
@@ -31,6 +35,12 @@ class SimpleToggleClient:
         self.socket_server = None
         self.socket_thread = None
         self.running = True
+        # A person is waiting for the clipboard: ask the server to schedule us ahead of streaming and batch work
+        self.client_id = f"toggle@{socket.gethostname()}"
+        # Sent as X-Decode-Preset: realtime, balanced or accurate
+        self.decode_preset = decode_preset
+        # Recordings are captured as WAV until wait_for_ready() agrees on VTT_UPLOAD_CODEC with the server
+        self.upload_codec = "wav"
         self.init_database()
         
         # Setup signal handlers for clean shutdown
@@ -100,17 +110,31 @@ class SimpleToggleClient:
             print(f"❌ Cannot connect to server: {e}")
             return False
     
+    def wait_for_ready(self, timeout: int = 60) -> bool:
+        """Block until the server has its model loaded and warmed up"""
+        try:
+            response = requests.get(f"{self.server_url}/ready", params={"wait": timeout}, timeout=timeout + 5)
+            if response.status_code == 200:
+                self.upload_codec = negotiate_codec(self.server_url)
+                return True
+            print(f"⏳ Server not ready yet ({response.json().get('stage', 'unknown')})")
+            return False
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Cannot connect to server: {e}")
+            return False
+    
     def start_recording(self):
         """Start recording audio"""
         if self.is_recording:
             return
         
-        self.current_audio_file = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
+        self.current_audio_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix(self.upload_codec))
         self.current_audio_file.close()
         
+        # Encoded while recording, so the upload is ready the moment recording stops
         cmd = [
             'ffmpeg', '-f', 'avfoundation', '-i', ':0',
-            '-ar', '16000', '-ac', '1',
+            '-ar', '16000', '-ac', '1', *ffmpeg_output_args(self.upload_codec),
             '-y', self.current_audio_file.name
         ]
         
@@ -244,28 +268,50 @@ class SimpleToggleClient:
             self.stop_recording()
     
     def transcribe_file(self, audio_file_path: str) -> Optional[Tuple[str, str]]:
-        """Send audio file to server for transcription"""
+        """Send audio file to server and show segments as they are decoded"""
         try:
             with open(audio_file_path, 'rb') as audio_file:
-                files = {'audio': ('audio.wav', audio_file, 'audio/wav')}
+                files = {'audio': (os.path.basename(audio_file_path), audio_file, content_type(audio_file_path))}
+                # stream=1: one NDJSON line per segment as soon as it is decoded, then a summary line
                 response = requests.post(
                     f"{self.server_url}/transcribe",
                     files=files,
-                    timeout=15
+                    params={'fields': 'text', 'stream': 1},
+                    headers={'X-Priority': 'interactive', 'X-Client-Id': self.client_id,
+                             'X-Decode-Preset': self.decode_preset},
+                    stream=True,
+                    timeout=30
                 )
             
-            if response.status_code == 200:
-                result = response.json()
-                text = result.get('text', '').strip()
-                language = result.get('language', 'unknown')
-                return text, language
-            else:
+            if response.status_code != 200:
                 print(f"❌ Transcription failed: {response.status_code}")
                 return None
+            
+            texts = []
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                message = json.loads(line)
+                if message['type'] == 'segment':
+                    texts.append(message['text'].strip())
+                    print(f"✏️  {message['text'].strip()}")
+                    # Keep the clipboard current so long recordings are usable before they finish
+                    self.copy_to_clipboard(" ".join(texts))
+                elif message['type'] == 'done':
+                    return message.get('text', '').strip(), message.get('language', 'unknown')
+                elif message['type'] == 'error':
+                    print(f"❌ Transcription failed: {message['status']} - {message['detail']}")
+                    return None
+            
+            print("❌ Transcription ended without a result")
+            return None
                 
         except requests.exceptions.RequestException as e:
             print(f"❌ Network error: {e}")
             return None
+        except ValueError as e:
+            print(f"❌ Bad response from server: {e}")
+            return None
     
     def get_char(self):
         """Get a single character from terminal without Enter"""
@@ -286,6 +332,11 @@ class SimpleToggleClient:
             print("2. Run: cd voice_to_text_local && source venv/bin/activate && python server.py")
             return
         
+        print("⏳ Waiting for server model to be ready...")
+        if not self.wait_for_ready():
+            print("❌ Server model did not become ready")
+            return
+        
         print("🎙️ Simple Toggle Voice-to-Text Client")
         print("📋 Text will be automatically copied to clipboard")
         print("⌨️ Press 'c' to start recording, press 'c' again to stop & transcribe")
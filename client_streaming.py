@@ -16,16 +16,32 @@ from typing import Optional
 import signal
 import sys
 import queue
+import json
+import socket
+import uuid
+from websockets.sync.client import connect as ws_connect
+from websockets.exceptions import ConnectionClosed
+
+from upload_codec import content_type, ffmpeg_output_args, negotiate_codec, suffix
 
 class StreamingVoiceClient:
     def __init__(self, server_url: str = "http://100.107.71.56:8000",
-                 chunk_duration: int = 5, output_file: str = "live_transcription.txt"):
+                 chunk_duration: int = 5, output_file: str = "live_transcription.txt",
+                 decode_preset: str = "realtime"):
         self.server_url = server_url.rstrip('/')
         self.chunk_duration = chunk_duration
         self.output_file = output_file
         self.db_path = "transcriptions.db"
         self.recording = False
         self.audio_queue = queue.Queue()
+        # Sent as X-Client-Id so the server schedules this client fairly against others
+        self.client_id = f"streaming@{socket.gethostname()}"
+        # Sent as X-Decode-Preset; realtime never retries a chunk, so a bad one can't stall the stream
+        self.decode_preset = decode_preset
+        # Sent as X-Session-Id while streaming, so the server keeps the language and context between chunks
+        self.session_id: Optional[str] = None
+        # Chunks are captured as WAV until wait_for_ready() agrees on VTT_UPLOAD_CODEC with the server
+        self.upload_codec = "wav"
         self.init_database()
         
         # Setup signal handlers for clean shutdown
@@ -85,14 +101,27 @@ class StreamingVoiceClient:
             print(f"❌ Cannot connect to server: {e}")
             return False
     
+    def wait_for_ready(self, timeout: int = 60) -> bool:
+        """Block until the server has its model loaded and warmed up"""
+        try:
+            response = requests.get(f"{self.server_url}/ready", params={"wait": timeout}, timeout=timeout + 5)
+            if response.status_code == 200:
+                self.upload_codec = negotiate_codec(self.server_url)
+                return True
+            print(f"⏳ Server not ready yet ({response.json().get('stage', 'unknown')})")
+            return False
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Cannot connect to server: {e}")
+            return False
+    
     def record_audio_chunk(self) -> Optional[str]:
         """Record a single audio chunk"""
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix(self.upload_codec))
         temp_file.close()
         
         cmd = [
             'ffmpeg', '-f', 'avfoundation', '-i', ':0',
-            '-ar', '16000', '-ac', '1', '-t', str(self.chunk_duration),
+            '-ar', '16000', '-ac', '1', '-t', str(self.chunk_duration), *ffmpeg_output_args(self.upload_codec),
             '-y', temp_file.name
         ]
         
@@ -114,10 +143,16 @@ class StreamingVoiceClient:
         """Send audio file to server for transcription"""
         try:
             with open(audio_file_path, 'rb') as audio_file:
-                files = {'audio': ('audio.wav', audio_file, 'audio/wav')}
+                files = {'audio': (os.path.basename(audio_file_path), audio_file, content_type(audio_file_path))}
+                headers = {'X-Priority': 'streaming', 'X-Client-Id': self.client_id,
+                           'X-Decode-Preset': self.decode_preset}
+                if self.session_id:
+                    headers['X-Session-Id'] = self.session_id
                 response = requests.post(
                     f"{self.server_url}/transcribe",
                     files=files,
+                    params={'fields': 'text'},  # only text and language are used
+                    headers=headers,
                     timeout=15
                 )
             
@@ -201,6 +236,7 @@ class StreamingVoiceClient:
             f.write("")  # Start with clean file
         
         self.recording = True
+        self.session_id = uuid.uuid4().hex
         
         # Start threads
         recorder_thread = threading.Thread(target=self.audio_recorder, daemon=True)
@@ -232,12 +268,97 @@ class StreamingVoiceClient:
             # Add final newline to file
             with open(self.output_file, 'a', encoding='utf-8') as f:
                 f.write("\n")
+            
+            self.end_session()
+    
+    def end_session(self):
+        """Release the server-side session; it would expire on its own after a few idle minutes"""
+        session_id, self.session_id = self.session_id, None
+        try:
+            requests.delete(f"{self.server_url}/sessions/{session_id}", timeout=5)
+        except requests.exceptions.RequestException:
+            pass
+    
+    def websocket_url(self) -> str:
+        """WebSocket URL of the server's streaming endpoint"""
+        return self.server_url.replace("https://", "wss://").replace("http://", "ws://") + "/ws/transcribe"
+    
+    def audio_sender(self, websocket, recorder: subprocess.Popen):
+        """Forward raw PCM from ffmpeg to the server in 100 ms frames"""
+        frame_bytes = 16000 * 2 // 10
+        try:
+            while self.recording:
+                pcm = recorder.stdout.read(frame_bytes)
+                if not pcm:
+                    break
+                websocket.send(pcm)
+            websocket.send(json.dumps({"type": "stop"}))
+        except ConnectionClosed:
+            pass
+    
+    def continuous_mode(self):
+        """Stream audio continuously over WebSocket and print partial results as they arrive"""
+        print(f"🎙️  Starting continuous transcription...")
+        print(f"📁 Output file: {self.output_file}")
+        print(f"🛑 Press Ctrl+C to stop\n")
+        
+        with open(self.output_file, 'w', encoding='utf-8') as f:
+            f.write("")  # Start with clean file
+        
+        cmd = [
+            'ffmpeg', '-f', 'avfoundation', '-i', ':0',
+            '-ar', '16000', '-ac', '1', '-f', 's16le', '-loglevel', 'quiet', 'pipe:1'
+        ]
+        
+        try:
+            websocket = ws_connect(self.websocket_url(), max_size=None,
+                                   additional_headers={'X-Client-Id': self.client_id,
+                                                       'X-Decode-Preset': self.decode_preset})
+        except Exception as e:
+            print(f"❌ Cannot open WebSocket: {e}")
+            return
+        
+        recorder = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self.recording = True
+        sender_thread = threading.Thread(target=self.audio_sender, args=(websocket, recorder), daemon=True)
+        sender_thread.start()
+        
+        try:
+            for message in websocket:
+                reply = json.loads(message)
+                if reply["type"] == "partial":
+                    print(f"\r💬 {reply['text'][-100:]}\033[K", end="", flush=True)
+                elif reply["type"] == "commit":
+                    timestamp = datetime.datetime.now().strftime('%H:%M:%S')
+                    print(f"\r📝 [{timestamp}] ({reply['language']}): {reply['text']}\033[K")
+                    self.append_to_file(reply["text"], reply["language"])
+                elif reply["type"] == "final":
+                    if reply["tail"]:
+                        print(f"\r📝 {reply['tail']}\033[K")
+                        self.append_to_file(reply["tail"], reply["language"])
+                    if reply["text"]:
+                        self.save_transcription(reply["text"], reply["language"], int(reply["duration"]))
+                        print("💾 Saved to database")
+                    break
+                elif reply["type"] == "error":
+                    print(f"\n❌ Server error: {reply['detail']}")
+        except ConnectionClosed:
+            print("\n❌ Connection closed by server")
+        finally:
+            self.recording = False
+            recorder.terminate()
+            sender_thread.join(timeout=2)
+            websocket.close()
+            
+            with open(self.output_file, 'a', encoding='utf-8') as f:
+                f.write("\n")
     
     def interactive_mode(self):
         """Interactive mode for streaming control"""
         print("🎙️  Streaming Voice-to-Text Client")
         print("Commands:")
         print("  's' = start streaming")
+        print("  'w' = start continuous streaming (WebSocket)")
         print("  'o' = view output file")
         print("  't' = test server")
         print("  'q' = quit")
@@ -250,10 +371,15 @@ class StreamingVoiceClient:
             elif command == 't':
                 self.test_server_connection()
             elif command == 's':
-                if not self.test_server_connection():
+                if not self.test_server_connection() or not self.wait_for_ready():
                     print("❌ Cannot start streaming - server not available")
                     continue
                 self.streaming_mode()
+            elif command == 'w':
+                if not self.test_server_connection() or not self.wait_for_ready():
+                    print("❌ Cannot start streaming - server not available")
+                    continue
+                self.continuous_mode()
             elif command == 'o':
                 if os.path.exists(self.output_file):
                     print(f"\n📄 Last 10 lines from {self.output_file}:")
@@ -267,7 +393,7 @@ class StreamingVoiceClient:
                 else:
                     print(f"❌ Output file {self.output_file} not found")
             else:
-                print("Unknown command. Use 's', 'o', 't', or 'q'")
+                print("Unknown command. Use 's', 'w', 'o', 't', or 'q'")
 
 def main():
     print("Streaming Voice-to-Text Client")
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+CPU inference tuning
+Dynamic int8 quantization of Whisper's Linear layers and torch thread configuration
+"""
+
+import os
+import torch
+import whisper
+from typing import Dict, Optional
+
+def available_cores() -> int:
+    """Cores this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def configure_threads(intra_op: Optional[int] = None, inter_op: Optional[int] = None) -> Dict[str, int]:
+    """Set torch thread pools; must run before the first forward pass to take full effect"""
+    # Intra-op threads do the matmuls; one inter-op thread is enough since batches run one at a time
+    torch.set_num_threads(intra_op or available_cores())
+    try:
+        torch.set_num_interop_threads(inter_op or 1)
+    except RuntimeError:
+        pass  # inter-op pool already started; keep whatever it has
+    return {"intra_op_threads": torch.get_num_threads(), "inter_op_threads": torch.get_num_interop_threads()}
+
+def quantize_int8(model: whisper.Whisper) -> whisper.Whisper:
+    """Apply dynamic int8 quantization to every Linear layer of a CPU model"""
+    # whisper subclasses nn.Linear only to cast weights to the input dtype, which is a no-op in fp32;
+    # quantize_dynamic matches exact types, so turn them back into plain nn.Linear first
+    for module in model.modules():
+        if type(module) is whisper.model.Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Batched Whisper inference
+Stacks the log-mel windows of several clips into one encoder pass and batch-decodes them
+Short clips can optionally be encoded over a window sized to them instead of the padded 30 seconds
+Decode presets trade accuracy for latency; rejected decodes climb the temperature ladder as a batch
+"""
+
+import contextlib
+import dataclasses
+import math
+import time
+import numpy as np
+import torch
+import torch.nn.functional as F
+import whisper
+from whisper.audio import HOP_LENGTH, N_FRAMES, N_SAMPLES, SAMPLE_RATE
+from whisper.decoding import DecodingTask
+from typing import List, Dict, Any, Optional, Tuple
+
+# Same thresholds model.transcribe() uses to reject a decode
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+# Seconds per timestamp token
+TIME_PRECISION = 0.02
+
+# Truncated encoder windows: silence kept after the clip, and the step window lengths are rounded up to
+# (a handful of distinct shapes keeps batching and kernel caches effective)
+SHORT_WINDOW_PAD_SECONDS = 1.0
+SHORT_WINDOW_STEP_SECONDS = 2.0
+
+# model.transcribe()'s temperature fallback ladder
+FALLBACK_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+class DecodePreset:
+    """Named decoding settings: how wide to search and how far up the temperature ladder to retry"""
+    def __init__(self, name: str, temperatures: Tuple[float, ...] = (0.0,), beam_size: Optional[int] = None,
+                 best_of: Optional[int] = None, condition_on_previous_text: bool = True):
+        self.name = name
+        self.temperatures = temperatures  # the first one is always tried; the rest are fallback retries
+        self.beam_size = beam_size  # None is greedy
+        self.best_of = best_of  # samples per retry at temperature > 0
+        self.condition_on_previous_text = condition_on_previous_text  # only used past one 30 s window
+
+    def options(self, temperature: float, fp16: bool, language: Optional[str] = None,
+                prompt: Optional[str] = None) -> whisper.DecodingOptions:
+        """DecodingOptions for one rung of the ladder (beam search at 0, sampling above, like model.transcribe())"""
+        if temperature > 0:
+            return whisper.DecodingOptions(temperature=temperature, best_of=self.best_of, language=language,
+                                           prompt=prompt, fp16=fp16)
+        return whisper.DecodingOptions(temperature=0.0, beam_size=self.beam_size, language=language,
+                                       prompt=prompt, fp16=fp16)
+
+    def transcribe_options(self, language: Optional[str] = None, prompt: Optional[str] = None) -> Dict[str, Any]:
+        """Keyword arguments giving model.transcribe() the same behaviour"""
+        return {"temperature": self.temperatures, "beam_size": self.beam_size, "best_of": self.best_of,
+                "condition_on_previous_text": self.condition_on_previous_text, "language": language,
+                "initial_prompt": prompt}
+
+    def retries(self, segments: List[Dict[str, Any]]) -> int:
+        """Fallback retries behind model.transcribe() segments: the ladder rung each 30 s window was accepted at"""
+        # Every segment of a window carries that window's temperature; count each window (seek) once
+        rungs = {s["seek"]: s["temperature"] for s in segments if s.get("temperature") in self.temperatures}
+        return sum(self.temperatures.index(temperature) for temperature in rungs.values())
+
+PRESETS = {
+    # Greedy, single attempt: worst-case latency is one decode
+    "realtime": DecodePreset("realtime", condition_on_previous_text=False),
+    # Greedy, with model.transcribe()'s fallback ladder for rejected decodes
+    "balanced": DecodePreset("balanced", FALLBACK_TEMPERATURES),
+    # Beam search, then best-of-5 sampling up the ladder
+    "accurate": DecodePreset("accurate", FALLBACK_TEMPERATURES, beam_size=5, best_of=5),
+}
+
+class TranscriptionTask:
+    """One clip queued for inference, plus everything that decides how it is decoded"""
+    def __init__(self, audio: np.ndarray, model_name: str, priority: str = "interactive", client: Optional[str] = None,
+                 preset: str = "balanced", language: Optional[str] = None, prompt: Optional[str] = None):
+        self.audio = audio
+        self.model_name = model_name
+        self.priority = priority  # scheduling class: interactive, streaming or batch
+        self.client = client  # who queued it, for round-robin between clients
+        self.preset = preset  # key into PRESETS
+        self.language = language  # fixed language code; None detects it per clip
+        self.prompt = prompt  # preceding text the decoder continues from (a session's previous chunk)
+        self.submitted = time.perf_counter()
+        self.timings: Dict[str, float] = {}  # stage -> seconds, filled in by the worker
+
+    def group_key(self) -> tuple:
+        """Tasks with equal keys can share one batched forward pass"""
+        return (self.model_name, self.preset, self.language, self.prompt)
+
+def segments_from_tokens(tokenizer, tokens: List[int], duration: float) -> List[Dict[str, Any]]:
+    """Split a decoded token sequence into segments at its timestamp tokens"""
+    segments = []
+    current = []
+    start = 0.0
+
+    for token in tokens:
+        if token >= tokenizer.timestamp_begin:
+            timestamp = (token - tokenizer.timestamp_begin) * TIME_PRECISION
+            if current:
+                segments.append((start, min(timestamp, duration), current))
+                current = []
+            start = timestamp
+        else:
+            current.append(token)
+
+    if current:
+        segments.append((start, duration, current))
+
+    result = []
+    for start, end, seg_tokens in segments:
+        text = tokenizer.decode(seg_tokens)
+        if text.strip():
+            result.append({"start": round(start, 2), "end": round(end, 2), "text": text, "tokens": seg_tokens})
+    return result
+
+def needs_fallback(result) -> bool:
+    """Check whether a decode should be retried one rung up the temperature ladder"""
+    if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+        return False  # silence, nothing to retry
+    return result.compression_ratio > COMPRESSION_RATIO_THRESHOLD or result.avg_logprob < LOGPROB_THRESHOLD
+
+def is_silence(result) -> bool:
+    """Check whether a decode should be dropped as no-speech, like model.transcribe() does"""
+    return result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD
+
+def build_result(tokenizer, decoded, duration: float) -> Dict[str, Any]:
+    """Turn a DecodingResult into the dict model.transcribe() would have returned"""
+    if is_silence(decoded):
+        return {"text": "", "language": decoded.language, "segments": []}
+
+    segments = segments_from_tokens(tokenizer, decoded.tokens, duration)
+    for i, segment in enumerate(segments):
+        segment.update({
+            "id": i,
+            "seek": 0,
+            "temperature": decoded.temperature,
+            "avg_logprob": decoded.avg_logprob,
+            "compression_ratio": decoded.compression_ratio,
+            "no_speech_prob": decoded.no_speech_prob,
+        })
+
+    return {
+        "text": "".join(segment["text"] for segment in segments),
+        "language": decoded.language,
+        "segments": segments
+    }
+
+def stitch_results(results: List[Dict[str, Any]], offsets: List[float]) -> Dict[str, Any]:
+    """Join the results of consecutive chunks into one result on the original timeline"""
+    segments = []
+    for result, offset in zip(results, offsets):
+        for segment in result.get("segments", []):
+            segments.append({
+                **segment,
+                "id": len(segments),
+                "start": round(segment["start"] + offset, 2),
+                "end": round(segment["end"] + offset, 2)
+            })
+
+    # Chunks decode their language independently; go with the majority among chunks that said anything
+    languages = [result.get("language") for result in results if result.get("text", "").strip()]
+    stitched = {
+        "text": " ".join(result["text"].strip() for result in results if result.get("text", "").strip()),
+        "language": max(set(languages), key=languages.count) if languages else "unknown",
+        "segments": segments
+    }
+    if results and "preset" in results[0]:
+        stitched.update(preset=results[0]["preset"], fallbacks=sum(result.get("fallbacks", 0) for result in results))
+    return stitched
+
+def short_window_frames(samples: int) -> int:
+    """Mel frames of the truncated window for a clip of this many samples (even, at most the full 30 s)"""
+    seconds = samples / SAMPLE_RATE + SHORT_WINDOW_PAD_SECONDS
+    window = math.ceil(seconds / SHORT_WINDOW_STEP_SECONDS) * SHORT_WINDOW_STEP_SECONDS
+    return min(N_FRAMES, int(window * SAMPLE_RATE / HOP_LENGTH))
+
+def embed_audio_window(model: whisper.Whisper, mel: torch.Tensor) -> torch.Tensor:
+    """Encoder forward over a mel window shorter than 30 s, adding only the matching slice of the positional embedding"""
+    encoder = model.encoder
+    x = F.gelu(encoder.conv1(mel))
+    x = F.gelu(encoder.conv2(x))
+    x = x.permute(0, 2, 1)
+    x = (x + encoder.positional_embedding[:x.shape[1]]).to(x.dtype)
+    for block in encoder.blocks:
+        x = block(x)
+    return encoder.ln_post(x)
+
+class WindowDecodingTask(DecodingTask):
+    """whisper's DecodingTask for encoder output of any window length (it only skips the encoder for 1500 frames)"""
+    def _get_audio_features(self, mel: torch.Tensor) -> torch.Tensor:
+        return mel.half() if self.options.fp16 else mel
+
+    def _detect_language(self, audio_features: torch.Tensor, tokens: torch.Tensor):
+        # Language detection runs the same shape check; present the truncated length as the model's context.
+        # Safe because decodes on one model never overlap (see transcribe_batch)
+        dims = self.model.dims
+        self.model.dims = dataclasses.replace(dims, n_audio_ctx=audio_features.shape[1])
+        try:
+            return super()._detect_language(audio_features, tokens)
+        finally:
+            self.model.dims = dims
+
+def decode_features(model: whisper.Whisper, audio_features: torch.Tensor, options: whisper.DecodingOptions) -> List[Any]:
+    """Decode precomputed encoder output, whether it covers the full 30 s window or a truncated one"""
+    task = WindowDecodingTask(model, options)
+    if (options.beam_size or options.best_of or 1) > 1:
+        # whisper broadcasts the encoder output across beams (or samples) rather than repeating it,
+        # which only lines up for a single clip: decode beam search and best-of one clip at a time
+        return [result for i in range(len(audio_features)) for result in task.run(audio_features[i:i + 1])]
+    return task.run(audio_features)
+
+def timed(timings: List[Dict[str, float]], stage: str, started: float, model: whisper.Whisper) -> float:
+    """Add the time since started to a stage of each given clip; returns the new start time"""
+    if model.device.type == "cuda":
+        torch.cuda.synchronize(model.device)  # otherwise the time lands in whichever stage syncs next
+    now = time.perf_counter()
+    for clip_timings in timings:
+        clip_timings[stage] = clip_timings.get(stage, 0.0) + now - started
+    return now
+
+def warmup_audio(seconds: float) -> np.ndarray:
+    """Deterministic synthetic clip (a gliding tone over light noise) for warming up kernels"""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    tone = 0.1 * np.sin(2 * np.pi * (150 + 100 * t) * t)
+    noise = 0.005 * np.random.RandomState(0).randn(len(t))
+    return (tone + noise).astype(np.float32)
+
+def transcribe_batch(model: whisper.Whisper, audios: List[np.ndarray],
+                     lock: Optional[contextlib.AbstractContextManager] = None,
+                     timings: Optional[List[Dict[str, float]]] = None,
+                     fallback: bool = True, short_clip_seconds: float = 0.0,
+                     preset: DecodePreset = PRESETS["balanced"], language: Optional[str] = None,
+                     prompt: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Transcribe several clips at once; clips longer than one window go through model.transcribe()"""
+    # whisper's decoder installs kv-cache hooks on the model, so two decodes must never overlap
+    lock = lock or contextlib.nullcontext()
+    # Per-clip stage durations; batch-wide stages are charged to every clip in the batch
+    timings = timings if timings is not None else [{} for _ in audios]
+    fp16 = model.device.type == "cuda"
+    results: List[Dict[str, Any]] = [None] * len(audios)
+    short = [i for i, audio in enumerate(audios) if len(audio) <= N_SAMPLES]
+
+    for i, audio in enumerate(audios):
+        if len(audio) > N_SAMPLES:
+            with lock:
+                started = time.perf_counter()
+                results[i] = model.transcribe(audio, fp16=fp16, **preset.transcribe_options(language, prompt))
+                timed([timings[i]], "transcribe", started, model)
+            results[i].update(preset=preset.name, fallbacks=preset.retries(results[i]["segments"]))
+
+    if not short:
+        return results
+
+    # Clips up to short_clip_seconds share an encoder window sized to the longest of them, the rest the padded 30 s
+    truncated = [i for i in short if len(audios[i]) <= short_clip_seconds * SAMPLE_RATE] if short_clip_seconds > 0 else []
+    padded = [i for i in short if i not in truncated]
+    windows = [(padded, N_FRAMES)]
+    if truncated:
+        windows.append((truncated, short_window_frames(max(len(audios[i]) for i in truncated))))
+    # Without fallback only the first rung runs (warm-up)
+    temperatures = preset.temperatures if fallback else preset.temperatures[:1]
+    decoded, retries = {}, {}
+    for indices, frames in windows:
+        if indices:
+            batch, batch_retries = decode_window(model, [audios[i] for i in indices], frames, lock,
+                                                 [timings[i] for i in indices], fp16, preset, temperatures, language, prompt)
+            decoded.update(zip(indices, batch))
+            retries.update(zip(indices, batch_retries))
+
+    tokenizer = whisper.tokenizer.get_tokenizer(
+        model.is_multilingual, num_languages=model.num_languages, task="transcribe"
+    )
+
+    for i in short:
+        results[i] = build_result(tokenizer, decoded[i], len(audios[i]) / SAMPLE_RATE)
+        results[i].update(preset=preset.name, fallbacks=retries[i])
+
+    return results
+
+def decode_window(model: whisper.Whisper, audios: List[np.ndarray], frames: int,
+                  lock: contextlib.AbstractContextManager, timings: List[Dict[str, float]], fp16: bool,
+                  preset: DecodePreset, temperatures: Tuple[float, ...],
+                  language: Optional[str], prompt: Optional[str]) -> Tuple[List[Any], List[int]]:
+    """Decode clips (each at most one window long) over a mel window of the given number of frames;
+    returns the accepted DecodingResults and how many fallback retries each clip took"""
+    with torch.no_grad():
+        started = time.perf_counter()
+        mel = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(audio, frames * HOP_LENGTH), model.dims.n_mels, device=model.device)
+            for audio in audios
+        ])
+        if fp16:
+            mel = mel.half()
+        started = timed(timings, "mel", started, model)
+
+        with lock:
+            started = time.perf_counter()
+            # One encoder pass for the whole batch; the decodes below all reuse its output
+            audio_features = model.embed_audio(mel) if frames == N_FRAMES else embed_audio_window(model, mel)
+            started = timed(timings, "encoder", started, model)
+            decoded = decode_features(model, audio_features, preset.options(temperatures[0], fp16, language, prompt))
+            started = timed(timings, "decoder", started, model)
+
+            retries = [0] * len(audios)
+            for temperature in temperatures[1:]:
+                rejected = [i for i, result in enumerate(decoded) if needs_fallback(result)]
+                if not rejected:
+                    break
+                # Only the rejected clips go up a rung, together, instead of one model.transcribe() each
+                redecoded = decode_features(model, audio_features[rejected], preset.options(temperature, fp16, language, prompt))
+                for i, result in zip(rejected, redecoded):
+                    decoded[i] = result
+                    retries[i] += 1
+                started = timed([timings[i] for i in rejected], "fallback", started, model)
+    return decoded, retries
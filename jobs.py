@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Persistent transcription job queue
+Uploads are spooled to disk and tracked in an APSW SQLite table so queued jobs survive a restart
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+import apsw
+from typing import Any, Dict, List, Optional
+
+# queued -> running -> completed | failed | cancelled
+FINISHED_STATES = ("completed", "failed", "cancelled")
+
+class JobStore:
+    def __init__(self, directory: str = "jobs"):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = apsw.Connection(os.path.join(directory, "jobs.db"))
+        self.init_database()
+
+    def init_database(self):
+        """Initialize APSW database for the job queue"""
+        cursor = self.db.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created REAL NOT NULL,
+                updated REAL NOT NULL,
+                filename TEXT,
+                model TEXT NOT NULL,
+                options TEXT NOT NULL,
+                progress REAL DEFAULT 0,
+                result TEXT,
+                error TEXT
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+
+    def audio_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.audio")
+
+    def create(self, content: bytes, filename: Optional[str], model: str, options: Dict[str, Any]) -> str:
+        """Spool an upload and queue it; returns the job id"""
+        job_id = uuid.uuid4().hex
+        with open(self.audio_path(job_id), "wb") as f:
+            f.write(content)
+        now = time.time()
+        with self.lock:
+            self.db.cursor().execute(
+                "INSERT INTO jobs (id, status, created, updated, filename, model, options) VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, now, now, filename, model, json.dumps(options))
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status, progress and (once completed) result of a job"""
+        with self.lock:
+            row = self.db.cursor().execute(
+                "SELECT id, status, created, updated, filename, model, options, progress, result, error FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        return self.to_dict(row) if row is not None else None
+
+    def recent(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Most recent jobs first, without their results"""
+        query = "SELECT id, status, created, updated, filename, model, options, progress, NULL, error FROM jobs"
+        params: tuple = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        with self.lock:
+            rows = list(self.db.cursor().execute(query + " ORDER BY created DESC LIMIT ?", params + (limit,)))
+        return [self.to_dict(row) for row in rows]
+
+    @staticmethod
+    def to_dict(row: tuple) -> Dict[str, Any]:
+        job_id, status, created, updated, filename, model, options, progress, result, error = row
+        return {
+            "id": job_id,
+            "status": status,
+            "created": created,
+            "updated": updated,
+            "filename": filename,
+            "model": model,
+            "options": json.loads(options),
+            "progress": round(progress or 0.0, 3),
+            "result": json.loads(result) if result else None,
+            "error": error
+        }
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Move the oldest queued job to running and return it"""
+        with self.lock:
+            with self.db:
+                row = self.db.cursor().execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    return None
+                self.db.cursor().execute(
+                    "UPDATE jobs SET status = 'running', updated = ? WHERE id = ?", (time.time(), row[0])
+                )
+        return self.get(row[0])
+
+    def load_audio(self, job_id: str) -> bytes:
+        with open(self.audio_path(job_id), "rb") as f:
+            return f.read()
+
+    def set_progress(self, job_id: str, progress: float):
+        with self.lock:
+            self.db.cursor().execute(
+                # Chunks finish concurrently, so updates can land out of order; progress never goes back
+                "UPDATE jobs SET progress = MAX(COALESCE(progress, 0), ?), updated = ? WHERE id = ? AND status = 'running'",
+                (progress, time.time(), job_id)
+            )
+
+    def finish(self, job_id: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        """Record the outcome of a running job and drop its spooled audio"""
+        with self.lock:
+            if error is not None:
+                self.db.cursor().execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, updated = ? WHERE id = ? AND status = 'running'",
+                    (error, time.time(), job_id)
+                )
+            else:
+                self.db.cursor().execute(
+                    "UPDATE jobs SET status = 'completed', progress = 1, result = ?, updated = ? WHERE id = ? AND status = 'running'",
+                    (json.dumps(result), time.time(), job_id)
+                )
+        self.remove_audio(job_id)
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """Cancel a queued or running job; returns its resulting status, None if unknown"""
+        with self.lock:
+            with self.db:
+                row = self.db.cursor().execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                if row is None:
+                    return None
+                if row[0] in FINISHED_STATES:
+                    return row[0]
+                self.db.cursor().execute(
+                    "UPDATE jobs SET status = 'cancelled', updated = ? WHERE id = ?", (time.time(), job_id)
+                )
+        self.remove_audio(job_id)
+        return "cancelled"
+
+    def remove_audio(self, job_id: str):
+        try:
+            os.unlink(self.audio_path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def requeue_running(self) -> int:
+        """Put jobs interrupted by a restart back in the queue"""
+        with self.lock:
+            self.db.cursor().execute(
+                "UPDATE jobs SET status = 'queued', progress = 0, updated = ? WHERE status = 'running'", (time.time(),)
+            )
+            return self.db.changes()
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in each state"""
+        with self.lock:
+            rows = list(self.db.cursor().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        return {status: count for status, count in rows}
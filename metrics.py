@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Prometheus metrics
+Minimal counters, gauges and histograms rendered in the Prometheus text exposition format
+"""
+
+import contextlib
+import os
+import resource
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Every metric registers itself here; render() walks this list
+REGISTRY: List["Metric"] = []
+
+# Latency buckets in seconds, from a cache hit up to a long file
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def escape_label(value: str) -> str:
+    """Escape a label value as the exposition format requires (backslash, double quote, newline)"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """Render a label set as {a="x",b="y"}"""
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def samples(self) -> List[str]:
+        return []
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[Tuple[str, ...], float] = {} if labels else {(): 0.0}
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self.lock:
+            return [f"{self.name}{format_labels(self.labels, key)} {value}" for key, value in self.values.items()]
+
+class Gauge(Metric):
+    """Gauge read from a callback at scrape time; the callback returns {label values: value}"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Dict[Tuple[str, ...], float]],
+                 labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self.callback = callback
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{format_labels(self.labels, key)} {value}" for key, value in self.callback().items()]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+        self.series: Dict[Tuple[str, ...], List[float]] = {}  # label values -> bucket counts + [sum, count]
+
+    def observe(self, value: float, *label_values: str):
+        with self.lock:
+            series = self.series.setdefault(label_values, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self.lock:
+            for key, series in self.series.items():
+                for bound, count in zip(self.buckets, series):
+                    labels = format_labels(self.labels, key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = format_labels(self.labels, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+                lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{format_labels(self.labels, key)} {series[-1]}")
+        return lines
+
+def render() -> str:
+    """All registered metrics in Prometheus text format"""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+def rss_bytes() -> float:
+    """Current resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return float(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE"))
+    except (OSError, ValueError, IndexError):
+        # Peak instead of current on platforms without /proc (kilobytes on Linux, bytes on macOS)
+        return float(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+class StageTimer:
+    """Per-request stage durations, reported as Server-Timing and fed into a histogram"""
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def update(self, stages: Optional[Dict[str, float]]):
+        for name, seconds in (stages or {}).items():
+            self.add(name, seconds)
+
+    def observe(self, histogram: Histogram):
+        for name, seconds in self.stages.items():
+            histogram.observe(seconds, name)
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, durations in milliseconds"""
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Whisper model registry
+Loads models lazily on first use and evicts the least recently used ones to stay within a memory budget
+"""
+
+import contextlib
+import gc
+import threading
+import time
+import torch
+import whisper
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List
+
+# Approximate parameter counts, used to make room before a model's real size is known
+APPROX_PARAMS = {
+    "tiny": 39_000_000,
+    "base": 74_000_000,
+    "small": 244_000_000,
+    "medium": 769_000_000,
+    "large": 1_550_000_000,
+    "turbo": 809_000_000,
+}
+
+def approx_model_bytes(name: str) -> int:
+    """Rough fp32 footprint of a model before it is loaded"""
+    base_name = name.split(".")[0].split("-")[0]
+    return APPROX_PARAMS.get(base_name, APPROX_PARAMS["large"]) * 4
+
+def model_bytes(model: torch.nn.Module) -> int:
+    """Actual memory held by a model's weights, including int8-packed Linear layers"""
+    total = 0
+    for value in model.state_dict().values():
+        tensors = value if isinstance(value, (tuple, list)) else (value,)
+        total += sum(t.numel() * t.element_size() for t in tensors if isinstance(t, torch.Tensor))
+    return total
+
+class ModelEntry:
+    def __init__(self, name: str, model: whisper.Whisper, load_time: float):
+        self.name = name
+        self.model = model
+        self.size_bytes = model_bytes(model)
+        self.load_time = load_time
+        self.last_used = time.time()
+        self.in_use = 0
+        # whisper's decoder installs kv-cache hooks on the model, so decodes on it must not overlap
+        self.lock = threading.Lock()
+
+class ModelRegistry:
+    def __init__(self, loader: Callable[[str], whisper.Whisper], memory_budget_bytes: int = 0):
+        self.loader = loader
+        self.memory_budget = memory_budget_bytes  # 0 means unlimited
+        self.entries: "OrderedDict[str, ModelEntry]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.loading_locks: Dict[str, threading.Lock] = {}
+        self.load_count = 0
+        self.eviction_count = 0
+
+    @staticmethod
+    def available() -> List[str]:
+        """Model names whisper knows how to download"""
+        return whisper.available_models()
+
+    def is_loaded(self, name: str) -> bool:
+        """Check whether a model is resident"""
+        with self.lock:
+            return name in self.entries
+
+    def used_bytes(self) -> int:
+        """Memory held by all resident models (lock held)"""
+        return sum(entry.size_bytes for entry in self.entries.values())
+
+    def evict_for(self, needed: int):
+        """Evict idle models, least recently used first, until needed bytes fit the budget (lock held)"""
+        if not self.memory_budget:
+            return
+        for name in list(self.entries):
+            if self.used_bytes() + needed <= self.memory_budget:
+                return
+            entry = self.entries[name]
+            if entry.in_use:
+                continue
+            print(f"Evicting Whisper {name} model ({entry.size_bytes / 1e6:.0f} MB)")
+            del self.entries[name]
+            self.eviction_count += 1
+
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def get(self, name: str) -> ModelEntry:
+        """Return the entry for a model, loading it on first use"""
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is not None:
+                self.entries.move_to_end(name)
+                return entry
+            loading_lock = self.loading_locks.setdefault(name, threading.Lock())
+
+        # Load outside the registry lock so other models stay usable; one loader per name
+        with loading_lock:
+            with self.lock:
+                entry = self.entries.get(name)
+                if entry is not None:
+                    return entry
+                self.evict_for(approx_model_bytes(name))
+
+            started = time.time()
+            model = self.loader(name)
+            entry = ModelEntry(name, model, time.time() - started)
+
+            with self.lock:
+                self.evict_for(entry.size_bytes)
+                self.entries[name] = entry
+                self.load_count += 1
+            return entry
+
+    def pin(self, name: str, load: bool = True) -> ModelEntry:
+        """Mark a model in use so it cannot be evicted, loading it first unless load is False"""
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is not None:
+                entry.in_use += 1
+                return entry
+        if not load:
+            raise RuntimeError(f"Whisper {name} model is not loaded")
+        entry = self.get(name)
+        with self.lock:
+            entry.in_use += 1
+        return entry
+
+    def unpin(self, entry: ModelEntry):
+        """Release a pin() once the model is no longer in use"""
+        with self.lock:
+            entry.in_use -= 1
+            entry.last_used = time.time()
+            if entry.name in self.entries:
+                self.entries.move_to_end(entry.name)
+
+    @contextlib.contextmanager
+    def acquire(self, name: str, load: bool = True) -> Iterator[ModelEntry]:
+        """Pin a model while it is in use so it cannot be evicted"""
+        entry = self.pin(name, load)
+        try:
+            yield entry
+        finally:
+            self.unpin(entry)
+
+    def info(self) -> Dict[str, Any]:
+        """Resident models and memory usage"""
+        with self.lock:
+            return {
+                "memory_budget_bytes": self.memory_budget,
+                "memory_used_bytes": self.used_bytes(),
+                "loads": self.load_count,
+                "evictions": self.eviction_count,
+                "models": [
+                    {
+                        "name": entry.name,
+                        "device": str(entry.model.device),
+                        "size_bytes": entry.size_bytes,
+                        "load_time": round(entry.load_time, 2),
+                        "in_use": entry.in_use,
+                        "last_used": entry.last_used
+                    }
+                    for entry in self.entries.values()
+                ]
+            }
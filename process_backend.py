@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Pre-forked inference workers
+Models loaded in the parent are inherited copy-on-write by forked worker processes, so N workers share one copy of the weights
+"""
+
+import multiprocessing
+import os
+import threading
+import torch
+import whisper
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from inference import PRESETS, transcribe_batch, warmup_audio
+
+# Filled in by the parent right before forking; workers see the same tensors through copy-on-write pages
+models: Dict[str, whisper.Whisper] = {}
+# transcribe_batch's short_clip_seconds inside this worker
+short_clip_seconds = 0.0
+
+# Times a dead worker (OOM kill, segfault) is replaced by re-forking the pool before giving up on it
+MAX_RESTARTS = 3
+
+def init_worker(threads: int, warmup_seconds: float, clip_seconds: float):
+    """Runs once in each forked worker: size its thread pool and warm up its kernels"""
+    global short_clip_seconds
+    short_clip_seconds = clip_seconds
+    torch.set_num_threads(threads)
+    if warmup_seconds > 0:
+        for model in models.values():
+            transcribe_batch(model, [warmup_audio(warmup_seconds)], fallback=False)
+
+def run_in_worker(model_name: str, audios: List[Any], preset: str, language: Optional[str],
+                  prompt: Optional[str]) -> Tuple[List[Dict[str, Any]], List[Dict[str, float]]]:
+    """Transcribe a batch inside a worker; stage timings travel back alongside the results"""
+    timings: List[Dict[str, float]] = [{} for _ in audios]
+    results = transcribe_batch(models[model_name], audios, timings=timings, short_clip_seconds=short_clip_seconds,
+                               preset=PRESETS[preset], language=language, prompt=prompt)
+    return results, timings
+
+class ProcessBackend:
+    def __init__(self, loaded_models: Dict[str, whisper.Whisper], workers: int, threads_per_worker: int,
+                 warmup_seconds: float = 0.0, short_clip_seconds: float = 0.0):
+        models.update(loaded_models)
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.initargs = (threads_per_worker, warmup_seconds, short_clip_seconds)
+        self.executor = self.make_executor()
+        self.restart_lock = threading.Lock()
+        self.restarts = 0
+        self.broken = False  # out of restarts: the server runs these models in-process instead
+
+    def make_executor(self) -> ProcessPoolExecutor:
+        # fork, not spawn: spawned workers would each load their own copy of the model
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=init_worker,
+            initargs=self.initargs
+        )
+
+    def start(self) -> int:
+        """Fork the workers and wait until they have warmed up; returns how many are running"""
+        # All submits land before any worker is idle, so each one forks a new worker
+        futures = [self.executor.submit(os.getpid) for _ in range(self.workers)]
+        return len({future.result() for future in futures})
+
+    def serves(self, model_name: str) -> bool:
+        """Only models resident at fork time live in the workers, and only while the pool works"""
+        return not self.broken and model_name in models
+
+    def transcribe(self, model_name: str, audios: List[Any], timings: List[Dict[str, float]],
+                   preset: str = "balanced", language: Optional[str] = None,
+                   prompt: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Run one batch on whichever worker is free (blocks the calling thread)"""
+        executor = self.executor
+        try:
+            results, worker_timings = executor.submit(
+                run_in_worker, model_name, audios, preset, language, prompt
+            ).result()
+        except BrokenProcessPool:
+            # A dead worker breaks the whole pool: every batch on it fails, and so would every later one
+            self.restart(executor)
+            raise RuntimeError("Inference worker process died; the batch was lost")
+        for clip_timings, worker_clip_timings in zip(timings, worker_timings):
+            for stage, seconds in worker_clip_timings.items():
+                clip_timings[stage] = clip_timings.get(stage, 0.0) + seconds
+        return results
+
+    def restart(self, broken: ProcessPoolExecutor):
+        """Replace a broken pool with freshly forked workers, or give up on it after MAX_RESTARTS"""
+        with self.restart_lock:
+            if self.executor is not broken or self.broken:
+                return  # another batch on the same pool already handled it
+            broken.shutdown(wait=False, cancel_futures=True)
+            if self.restarts >= MAX_RESTARTS:
+                self.broken = True
+                print(f"Inference workers died {self.restarts + 1} times; running in-process from now on")
+                return
+            self.restarts += 1
+            self.executor = self.make_executor()
+            try:
+                forked = self.start()
+            except BrokenProcessPool:
+                self.broken = True
+                print("Re-forked inference workers died during startup; running in-process from now on")
+                return
+            print(f"Inference worker died; re-forked {forked} worker(s) (restart {self.restarts}/{MAX_RESTARTS})")
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def info(self) -> Dict[str, Any]:
+        return {"workers": self.workers, "threads_per_worker": self.threads_per_worker, "models": sorted(models),
+                "restarts": self.restarts, "broken": self.broken}
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+On-demand request profiling
+Runs one call under cProfile and/or the torch profiler and keeps the traces on disk for download
+"""
+
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import uuid
+import torch
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PROFILERS = ("cprofile", "torch")
+
+# Files written per profile: kind -> (file suffix, media type)
+ARTIFACTS = {
+    "pstats": (".pstats", "application/octet-stream"),
+    "trace": (".trace.json", "application/json"),
+    "summary": (".txt", "text/plain"),
+}
+
+def parse_profilers(value: str) -> Tuple[str, ...]:
+    """Profilers named by an X-Profile header: '1'/'all', or a comma list of cprofile and torch"""
+    value = value.strip().lower()
+    if value in ("1", "true", "all"):
+        return PROFILERS
+    names = tuple(name.strip() for name in value.split(",") if name.strip())
+    unknown = [name for name in names if name not in PROFILERS]
+    if not names or unknown:
+        raise ValueError(f"X-Profile must be 1, all, or a comma list of {', '.join(PROFILERS)}")
+    return names
+
+class ProfileStore:
+    def __init__(self, directory: str = "profiles", max_profiles: int = 20):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        os.makedirs(directory, exist_ok=True)
+        # torch.profiler is process-wide, so only one profiled call runs at a time
+        self.lock = threading.Lock()
+
+    def path(self, profile_id: str, kind: str) -> str:
+        return os.path.join(self.directory, profile_id + ARTIFACTS[kind][0])
+
+    def run(self, profilers: Tuple[str, ...], label: str, fn: Callable[..., Any], *args) -> Tuple[Any, str]:
+        """Call fn(*args) under the given profilers; returns (its result, profile id)"""
+        profile_id = uuid.uuid4().hex[:16]
+        profile = cProfile.Profile() if "cprofile" in profilers else None
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+
+        with self.lock:
+            started = time.perf_counter()
+            with contextlib.ExitStack() as stack:
+                traced = None
+                if "torch" in profilers:
+                    traced = stack.enter_context(torch.profiler.profile(activities=activities, record_shapes=True))
+                if profile is not None:
+                    profile.enable()
+                    stack.callback(profile.disable)
+                result = fn(*args)
+            seconds = time.perf_counter() - started
+
+        summary = [f"{label}: {seconds * 1000:.1f} ms wall"]
+        if profile is not None:
+            profile.dump_stats(self.path(profile_id, "pstats"))
+            text = io.StringIO()
+            pstats.Stats(profile, stream=text).sort_stats("cumulative").print_stats(40)
+            summary.append(text.getvalue())
+        if traced is not None:
+            traced.export_chrome_trace(self.path(profile_id, "trace"))
+            sort_by = "cuda_time_total" if torch.cuda.is_available() else "cpu_time_total"
+            summary.append(traced.key_averages().table(sort_by=sort_by, row_limit=40))
+        with open(self.path(profile_id, "summary"), "w") as f:
+            f.write("\n\n".join(summary))
+
+        with open(os.path.join(self.directory, f"{profile_id}.json"), "w") as f:
+            json.dump({
+                "id": profile_id,
+                "created": time.time(),
+                "label": label,
+                "seconds": round(seconds, 4),
+                "profilers": list(profilers),
+                "files": [kind for kind in ARTIFACTS if os.path.exists(self.path(profile_id, kind))]
+            }, f)
+        self.prune()
+        return result, profile_id
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        # Ids are hex; anything else can't name a profile (and can't escape the directory)
+        if not all(c in "0123456789abcdef" for c in profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{profile_id}.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def recent(self) -> List[Dict[str, Any]]:
+        """Stored profiles, newest first"""
+        profiles = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json") and not name.endswith(".trace.json"):
+                profile = self.get(name[:-len(".json")])
+                if profile is not None:
+                    profiles.append(profile)
+        return sorted(profiles, key=lambda profile: profile["created"], reverse=True)
+
+    def prune(self):
+        """Drop the oldest profiles beyond max_profiles"""
+        for profile in self.recent()[self.max_profiles:]:
+            for kind in ARTIFACTS:
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(self.path(profile["id"], kind))
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(os.path.join(self.directory, f"{profile['id']}.json"))
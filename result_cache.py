@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Transcription result cache
+Content-addressed LRU in memory, optionally backed by an APSW SQLite store that survives restarts
+Identical requests arriving while one is being computed wait for that computation instead of repeating it
+"""
+
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import apsw
+import numpy as np
+from typing import Any, Dict, Optional
+
+def make_key(audio: np.ndarray, model_name: str, options: Optional[Dict[str, Any]] = None) -> str:
+    """Hash decoded audio together with everything else that affects the transcription"""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(audio, dtype=np.float32).tobytes())
+    digest.update(model_name.encode("utf-8"))
+    digest.update(json.dumps(options or {}, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+class TranscriptionCache:
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024,
+                 db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.db_path = db_path
+        self.entries: "OrderedDict[str, str]" = OrderedDict()  # key -> JSON-encoded result
+        self.size = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.coalesced = 0
+
+        # Keys being computed right now -> Future resolved with the result (None if it was abandoned)
+        self.in_flight: Dict[str, Future] = {}
+
+        self.db = None
+        self.disk_entries = 0
+        self.disk_bytes = 0
+        if db_path:
+            self.init_database()
+
+    def init_database(self):
+        """Initialize APSW database for persisted results"""
+        self.db = apsw.Connection(self.db_path)
+        cursor = self.db.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                result TEXT NOT NULL
+            )
+        ''')
+        self.disk_entries, self.disk_bytes = cursor.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length(result)), 0) FROM results"
+        ).fetchone()
+        if self.disk_over_limits():
+            self.prune_database()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a result, promoting disk hits into memory"""
+        with self.lock:
+            encoded = self.entries.get(key)
+            if encoded is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(encoded)
+
+            if self.db is not None:
+                row = self.db.cursor().execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self.disk_hits += 1
+                    self.db.cursor().execute("UPDATE results SET timestamp = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE key = ?", (key,))
+                    self.insert(key, row[0])
+                    return json.loads(row[0])
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """Store a result in memory (and on disk when persistence is enabled), handing it to any waiters"""
+        encoded = json.dumps(result)
+        with self.lock:
+            self.insert(key, encoded)
+            if self.db is not None:
+                cursor = self.db.cursor()
+                replaced = cursor.execute("SELECT length(result) FROM results WHERE key = ?", (key,)).fetchone()
+                cursor.execute(
+                    "INSERT OR REPLACE INTO results (key, timestamp, result) VALUES (?, strftime('%Y-%m-%d %H:%M:%f', 'now'), ?)",
+                    (key, encoded)
+                )
+                if replaced is not None:
+                    self.disk_entries -= 1
+                    self.disk_bytes -= replaced[0]
+                self.disk_entries += 1
+                self.disk_bytes += len(encoded)
+                if self.disk_over_limits():
+                    self.prune_database()
+            waiting = self.in_flight.pop(key, None)
+        if waiting is not None:
+            waiting.set_result(json.loads(encoded))
+
+    def begin(self, key: str) -> Optional[Future]:
+        """Claim key for computation; returns None if the caller should compute it, else a Future for the other caller's result"""
+        with self.lock:
+            waiting = self.in_flight.get(key)
+            if waiting is not None:
+                self.coalesced += 1
+                return waiting
+            self.in_flight[key] = Future()
+            return None
+
+    def end(self, key: str):
+        """Release a claim from begin(); waiters still pending (the computation failed or was abandoned) get None"""
+        with self.lock:
+            waiting = self.in_flight.pop(key, None)
+        if waiting is not None:
+            waiting.set_result(None)
+
+    def insert(self, key: str, encoded: str):
+        """Add an entry to the in-memory LRU and evict down to the limits (lock held)"""
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        if len(encoded) > self.max_bytes:
+            return
+
+        self.entries[key] = encoded
+        self.size += len(encoded)
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def disk_over_limits(self) -> bool:
+        """Whether the disk store holds more than the cache limits allow (lock held)"""
+        return self.disk_entries > self.max_entries or self.disk_bytes > self.max_bytes
+
+    def prune_database(self):
+        """Evict least recently used rows from the disk store to 90% of the cache limits (lock held)"""
+        # Pruning scans the whole table, so leave headroom instead of doing it again on the next put
+        self.db.cursor().execute('''
+            DELETE FROM results WHERE key IN (
+                SELECT key FROM (
+                    SELECT key,
+                           ROW_NUMBER() OVER newest_first AS position,
+                           SUM(length(result)) OVER newest_first AS total
+                    FROM results
+                    WINDOW newest_first AS (ORDER BY timestamp DESC, rowid DESC)
+                ) WHERE position > ? OR total > ?
+            )
+        ''', (int(self.max_entries * 0.9), int(self.max_bytes * 0.9)))
+        self.disk_evictions += self.db.changes()
+        self.disk_entries, self.disk_bytes = self.db.cursor().execute(
+            "SELECT COUNT(*), COALESCE(SUM(length(result)), 0) FROM results"
+        ).fetchone()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters for sizing the cache"""
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "persistent": self.db is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self.in_flight),
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0
+            }
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Dynamic micro-batching scheduler
+Collects requests arriving within a short window and hands them to the model as one batch
+Batches are filled by priority class, round-robin between clients within a class, so no client can starve the others
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+# Most urgent first: a person waiting on the result, live audio chunks, background files
+PRIORITIES = ("interactive", "streaming", "batch")
+
+class QueueFullError(Exception):
+    """Raised by submit() when the scheduler is at capacity"""
+    def __init__(self, retry_after: int):
+        super().__init__(f"Inference queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class BatchScheduler:
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 8, max_wait_ms: float = 30.0,
+                 workers: int = 1, max_queue_size: int = 32, aging_seconds: float = 5.0,
+                 reserved_slots: Optional[int] = None):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        # Admission by class: each more urgent class keeps reserved_slots of the queue that less urgent ones can't
+        # take, so background work filling the queue still leaves room for a person waiting on a result
+        reserved = max_queue_size // 4 if reserved_slots is None else reserved_slots
+        self.queue_limits = {
+            priority: max(1, max_queue_size - rank * reserved) for rank, priority in enumerate(PRIORITIES)
+        }
+        # Every aging_seconds a request waits counts as one class more urgent, so batch work still drains under load
+        self.aging_seconds = aging_seconds
+        self.thread = None
+        self.running = False
+
+        # priority -> client -> that client's queued (item, future, enqueued, priority) entries;
+        # the client order within a class is the round-robin order
+        self.pending: Dict[str, "OrderedDict[str, Deque[tuple]]"] = {priority: OrderedDict() for priority in PRIORITIES}
+        self.queued = 0
+        self.pending_lock = threading.Condition()
+
+        # Batches run on a dedicated pool; the slots semaphore keeps the collector from
+        # dispatching more batches than there are workers, so queued requests keep batching up
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self.slots = threading.Semaphore(workers)
+        self.depth_lock = threading.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+
+        # Stats
+        self.stats_lock = threading.Lock()
+        self.batch_count = 0
+        self.request_count = 0
+        self.error_count = 0
+        self.batch_sizes: Dict[int, int] = {}
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+        self.total_batch_time = 0.0
+        self.rejected_count = 0
+        # priority -> [requests, total queue wait, max queue wait]
+        self.waits: Dict[str, List[float]] = {priority: [0, 0.0, 0.0] for priority in PRIORITIES}
+
+    def start(self):
+        """Start the batching thread"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the batching thread after the current batch"""
+        with self.pending_lock:
+            self.running = False
+            self.pending_lock.notify_all()
+        if self.thread:
+            self.thread.join(timeout=5)
+        self.executor.shutdown(wait=False)
+
+    def submit(self, item: Any, priority: str = "interactive", client: Optional[str] = None) -> Future:
+        """Queue an item; raises QueueFullError once the queue is full for this priority class"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'")
+        with self.depth_lock:
+            if self.waiting >= self.queue_limits[priority]:
+                with self.stats_lock:
+                    self.rejected_count += 1
+                raise QueueFullError(self.retry_after())
+            self.waiting += 1
+
+        future = Future()
+        with self.pending_lock:
+            self.pending[priority].setdefault(client or "", deque()).append((item, future, time.monotonic(), priority))
+            self.queued += 1
+            self.pending_lock.notify()
+        return future
+
+    def retry_after(self) -> int:
+        """Estimate in whole seconds how long until the current backlog drains"""
+        with self.stats_lock:
+            avg_batch_time = self.total_batch_time / self.batch_count if self.batch_count else 1.0
+        batches_ahead = math.ceil((self.waiting + self.in_flight) / (self.max_batch_size * self.workers))
+        return max(1, math.ceil(batches_ahead * avg_batch_time))
+
+    def queue_depth(self) -> Dict[str, int]:
+        """Requests waiting for a batch and requests currently being computed"""
+        with self.depth_lock:
+            return {
+                "queue_depth": self.waiting,
+                "in_flight": self.in_flight,
+                "queue_capacity": self.max_queue_size,
+                "queue_limits": dict(self.queue_limits),
+                "workers": self.workers
+            }
+
+    def collect_batch(self) -> List[tuple]:
+        """Block for the first request, wait out the window (or a full batch), then take the most urgent requests"""
+        with self.pending_lock:
+            while self.running and not self.queued:
+                self.pending_lock.wait()
+            deadline = time.monotonic() + self.max_wait
+            while self.running and self.queued < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.pending_lock.wait(remaining)
+            if not self.running:
+                return []
+            # Chosen when the window closes, so an interactive request arriving late in it still goes first
+            return [self.pop_next() for _ in range(min(self.queued, self.max_batch_size))]
+
+    def pop_next(self) -> tuple:
+        """Oldest entry of the next client in the most urgent class, counting aging (pending_lock held)"""
+        now = time.monotonic()
+        best, best_rank = None, None
+        for rank, priority in enumerate(PRIORITIES):
+            clients = self.pending[priority]
+            if not clients:
+                continue
+            oldest = min(entries[0][2] for entries in clients.values())
+            effective = rank - (now - oldest) / self.aging_seconds if self.aging_seconds > 0 else rank
+            if best_rank is None or effective < best_rank:
+                best, best_rank = priority, effective
+
+        clients = self.pending[best]
+        client, entries = next(iter(clients.items()))
+        entry = entries.popleft()
+        # Round-robin: this client goes to the back of its class
+        del clients[client]
+        if entries:
+            clients[client] = entries
+        self.queued -= 1
+        return entry
+
+    def run(self):
+        """Batching loop"""
+        while self.running:
+            # Wait for a free worker before collecting, so the batch grows while all workers are busy
+            self.slots.acquire()
+            batch = self.collect_batch()
+            if not batch:
+                self.slots.release()
+                continue
+
+            with self.depth_lock:
+                self.waiting -= len(batch)
+                self.in_flight += len(batch)
+            self.executor.submit(self.run_batch, batch)
+
+    def run_batch(self, batch: List[tuple]):
+        """Process one batch and fan the results back out to the waiting futures"""
+        try:
+            self.process(batch)
+        finally:
+            with self.depth_lock:
+                self.in_flight -= len(batch)
+            self.slots.release()
+
+    def process(self, batch: List[tuple]):
+        """Run process_batch and record timing stats"""
+        # Callers that gave up (a cancelled job, a closed connection) don't need their result computed;
+        # the rest are marked running, so a late cancel can no longer race the results being set
+        batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.monotonic()
+        items = [item for item, _, _, _ in batch]
+        futures = [future for _, future, _, _ in batch]
+
+        try:
+            results = self.process_batch(items)
+            for future, result in zip(futures, results):
+                # process_batch may return an exception for an item that failed on its own
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            with self.stats_lock:
+                self.error_count += 1
+
+        finished = time.monotonic()
+        with self.stats_lock:
+            self.batch_count += 1
+            self.request_count += len(batch)
+            self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+            self.total_batch_time += finished - started
+            for _, _, enqueued, priority in batch:
+                wait = started - enqueued
+                self.total_wait += wait
+                self.max_wait_seen = max(self.max_wait_seen, wait)
+                waits = self.waits[priority]
+                waits[0] += 1
+                waits[1] += wait
+                waits[2] = max(waits[2], wait)
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch size and queue wait statistics for tuning the window"""
+        with self.stats_lock:
+            batches = max(self.batch_count, 1)
+            requests = max(self.request_count, 1)
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": self.batch_count,
+                "requests": self.request_count,
+                "errors": self.error_count,
+                "rejected": self.rejected_count,
+                "avg_batch_size": round(self.request_count / batches, 2),
+                "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+                "avg_queue_wait_ms": round(self.total_wait / requests * 1000, 2),
+                "max_queue_wait_ms": round(self.max_wait_seen * 1000, 2),
+                "avg_batch_time_ms": round(self.total_batch_time / batches * 1000, 2),
+                "aging_seconds": self.aging_seconds,
+                "queue_wait_by_priority": {
+                    priority: {
+                        "requests": int(count),
+                        "avg_queue_wait_ms": round(total / max(count, 1) * 1000, 2),
+                        "max_queue_wait_ms": round(longest * 1000, 2)
+                    }
+                    for priority, (count, total, longest) in self.waits.items()
+                }
+            }
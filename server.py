@@ -5,13 +5,43 @@ Runs on Ubuntu GPU server, handles audio transcription using Whisper
 """
 
 import os
-import tempfile
+import json
+import contextlib
+import time
+import asyncio
+import threading
 import whisper
 import torch
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from whisper.audio import SAMPLE_RATE
+from fastapi import FastAPI, File, Form, Query, Request, Response, UploadFile, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import HTTPConnection
 import uvicorn
-from typing import Optional
+from whisper.tokenizer import LANGUAGES, TO_LANGUAGE_CODE
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Literal, Optional, Tuple
+
+try:
+    import msgpack  # optional: compact binary responses for clients that ask for them
+except ImportError:
+    msgpack = None
+
+from audio_decode import decode_audio, supported_codecs, AudioDecodeError
+from cpu_inference import available_cores, configure_threads, quantize_int8
+from inference import PRESETS, TranscriptionTask, stitch_results, transcribe_batch, warmup_audio
+from jobs import JobStore
+import metrics
+from metrics import Counter, Gauge, Histogram, StageTimer
+from model_registry import ModelRegistry
+from process_backend import ProcessBackend
+from profiling import ARTIFACTS, ProfileStore, parse_profilers
+from result_cache import TranscriptionCache, make_key
+from scheduler import PRIORITIES, BatchScheduler, QueueFullError
+from sessions import SessionStore, TranscriptionSession
+from streaming import StreamingSession
+from vad import detect_speech, split_at_silence, trim_silence
 
 app = FastAPI(title="Voice-to-Text Server", version="0.1.0")
 
@@ -23,82 +53,1056 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global model instance
-model: Optional[whisper.Whisper] = None
+# Compress JSON responses bigger than this for clients that send Accept-Encoding: gzip
+GZIP_MIN_BYTES = int(os.environ.get("VTT_GZIP_MIN_BYTES", "1000"))
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_BYTES)
+
+# Use 'turbo' model for faster processing on 12GB GPU; requests may pick another with ?model=
+DEFAULT_MODEL = os.environ.get("VTT_MODEL", "turbo")
+# Resident models are evicted least-recently-used first beyond this budget (0 = unlimited)
+MODEL_MEMORY_MB = float(os.environ.get("VTT_MODEL_MEMORY_MB", "0"))
+
+# CPU-only hosts: 'int8' applies dynamic quantization to Linear layers, 'fp32' keeps full precision
+CPU_MODE = os.environ.get("VTT_CPU_MODE", "int8")
+CPU_THREADS = int(os.environ.get("VTT_CPU_THREADS", "0")) or None
+CPU_INTEROP_THREADS = int(os.environ.get("VTT_CPU_INTEROP_THREADS", "0")) or None
+
+# Micro-batching window: requests arriving within BATCH_MAX_WAIT_MS share one forward pass
+BATCH_MAX_SIZE = int(os.environ.get("VTT_BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("VTT_BATCH_MAX_WAIT_MS", "30"))
+
+# Inference worker pool and the bounded queue in front of it
+INFERENCE_WORKERS = int(os.environ.get("VTT_INFERENCE_WORKERS", "1"))
+MAX_QUEUE_SIZE = int(os.environ.get("VTT_MAX_QUEUE_SIZE", "32"))
+# Queue slots only interactive requests may use, and as many again only interactive and streaming ones may
+QUEUE_RESERVED_SLOTS = int(os.environ.get("VTT_QUEUE_RESERVED_SLOTS", str(MAX_QUEUE_SIZE // 4)))
+# Seconds of queueing after which a request is treated as one priority class more urgent
+PRIORITY_AGING_SECONDS = float(os.environ.get("VTT_PRIORITY_AGING_SECONDS", "5"))
+
+# 'process' (CPU only) forks PROCESS_WORKERS inference processes once the default model is loaded;
+# they share its weights copy-on-write, so all cores get used without a copy of the model per worker
+INFERENCE_BACKEND = os.environ.get("VTT_INFERENCE_BACKEND", "thread")
+PROCESS_WORKERS = int(os.environ.get("VTT_PROCESS_WORKERS", "0")) or max(1, available_cores() // 4)
+USE_PROCESS_BACKEND = INFERENCE_BACKEND == "process" and not torch.cuda.is_available()
+SCHEDULER_WORKERS = PROCESS_WORKERS if USE_PROCESS_BACKEND else INFERENCE_WORKERS
+
+# WebSocket streaming: re-decode every WS_DECODE_INTERVAL seconds of new audio,
+# keep the rolling buffer under one 30 s window so it stays on the batched path
+WS_DECODE_INTERVAL = float(os.environ.get("VTT_WS_DECODE_INTERVAL", "1.0"))
+WS_MAX_BUFFER_SECONDS = float(os.environ.get("VTT_WS_MAX_BUFFER_SECONDS", "20"))
+
+# Voice activity detection: trim silence before inference and skip uploads with no speech
+VAD_ENABLED = os.environ.get("VTT_VAD", "1") == "1"
+VAD_MIN_SPEECH_MS = float(os.environ.get("VTT_VAD_MIN_SPEECH_MS", "250"))
+VAD_PADDING_MS = float(os.environ.get("VTT_VAD_PADDING_MS", "200"))
+
+# Long uploads are split at pauses into chunks of at most SPLIT_CHUNK_SECONDS (one Whisper window)
+# that are transcribed concurrently; SPLIT_MAX_IN_FLIGHT caps how many chunks of one upload are queued at once
+SPLIT_LONG_AUDIO = os.environ.get("VTT_SPLIT_LONG_AUDIO", "1") == "1"
+SPLIT_CHUNK_SECONDS = min(float(os.environ.get("VTT_SPLIT_CHUNK_SECONDS", "30")), 30.0)
+SPLIT_MAX_IN_FLIGHT = int(os.environ.get("VTT_SPLIT_MAX_IN_FLIGHT", str(BATCH_MAX_SIZE * SCHEDULER_WORKERS)))
+
+# stream=1: the first chunk is cut at most STREAM_FIRST_CHUNK_SECONDS long and decoded on its own before the rest
+# are queued, STREAM_MAX_IN_FLIGHT at a time, so segments arrive chunk by chunk instead of all in one batch
+STREAM_FIRST_CHUNK_SECONDS = min(float(os.environ.get("VTT_STREAM_FIRST_CHUNK_SECONDS", "8")), SPLIT_CHUNK_SECONDS)
+STREAM_MAX_IN_FLIGHT = int(os.environ.get("VTT_STREAM_MAX_IN_FLIGHT", "2"))
+
+# Most files accepted by one /transcribe/batch request
+BATCH_MAX_FILES = int(os.environ.get("VTT_BATCH_MAX_FILES", "64"))
+
+# Asynchronous jobs: uploads are spooled under JOBS_DIR and processed by JOB_WORKERS background workers
+JOBS_DIR = os.environ.get("VTT_JOBS_DIR", "jobs")
+JOB_WORKERS = int(os.environ.get("VTT_JOB_WORKERS", "2"))
+
+# Opt-in short-clip fast path: clips up to this many seconds are encoded over a window sized to them
+# instead of the padded 30 s (0 disables; check accuracy on your audio with validate_short_clips.py first)
+SHORT_CLIP_SECONDS = min(float(os.environ.get("VTT_SHORT_CLIP_SECONDS", "0")), 30.0)
+
+# Decode presets (realtime, balanced, accurate) used when a request names none; streaming-class requests
+# default to STREAMING_PRESET, which should keep worst-case latency to a single decode
+DEFAULT_PRESET = os.environ.get("VTT_DECODE_PRESET", "balanced")
+STREAMING_PRESET = os.environ.get("VTT_STREAMING_PRESET", "realtime")
+
+# Chunked streaming sessions (X-Session-Id): dropped after this long without a chunk, oldest first beyond VTT_SESSION_MAX
+SESSION_IDLE_SECONDS = float(os.environ.get("VTT_SESSION_IDLE_SECONDS", "300"))
+SESSION_MAX = int(os.environ.get("VTT_SESSION_MAX", "1000"))
+
+# Opt-in profiling: an X-Profile header runs that /transcribe call under cProfile / torch.profiler
+PROFILING_ENABLED = os.environ.get("VTT_PROFILING_ENABLED", "0") == "1"
+PROFILES_DIR = os.environ.get("VTT_PROFILES_DIR", "profiles")
+PROFILES_MAX = int(os.environ.get("VTT_PROFILES_MAX", "20"))
+
+# Startup warmup: a synthetic clip this long is transcribed before /ready succeeds (0 disables)
+WARMUP_SECONDS = float(os.environ.get("VTT_WARMUP_SECONDS", "2"))
+# Longest /ready?wait= long-poll the server will honour
+MAX_READY_WAIT = 60.0
+
+# Result cache: in-memory LRU, persisted to SQLite when VTT_CACHE_DB is set
+CACHE_MAX_ENTRIES = int(os.environ.get("VTT_CACHE_MAX_ENTRIES", "1024"))
+CACHE_MAX_MB = float(os.environ.get("VTT_CACHE_MAX_MB", "64"))
+CACHE_DB = os.environ.get("VTT_CACHE_DB") or None
+
+# Global model registry
+registry: Optional[ModelRegistry] = None
+scheduler: Optional[BatchScheduler] = None
+cache: Optional[TranscriptionCache] = None
+process_backend: Optional[ProcessBackend] = None
+jobs: Optional[JobStore] = None
+sessions: Optional[SessionStore] = None
+profiles: Optional[ProfileStore] = None
+# Background job workers, and the asyncio task of each running job so DELETE can cancel it
+job_workers: List[asyncio.Task] = []
+running_jobs: Dict[str, asyncio.Task] = {}
+job_wakeup: Optional[asyncio.Event] = None
+
+# Startup progress reported by /ready
+readiness: Dict[str, Any] = {"ready": False, "stage": "starting", "load_seconds": None, "warmup_seconds": None,
+                             "warmup_rtf": None, "error": None}
+ready_event: Optional[asyncio.Event] = None
+# Set once startup has forked the inference processes (or given up on them); batches wait for it, so the parent
+# never runs a forward pass before the fork
+fork_done = threading.Event()
+
+# Prometheus metrics served on /metrics
+STAGE_SECONDS = Histogram("vtt_stage_seconds", "Time spent in each /transcribe stage", ("stage",))
+REQUEST_SECONDS = Histogram("vtt_request_seconds", "HTTP request latency", ("path",))
+REQUESTS = Counter("vtt_requests_total", "HTTP requests", ("path", "status"))
+FALLBACKS = Counter("vtt_temperature_fallbacks_total", "Decodes retried one rung up the temperature ladder", ("preset",))
+QUEUE_WAIT_SECONDS = Histogram("vtt_queue_wait_seconds", "Time clips waited for an inference batch", ("priority",))
+REAL_TIME_FACTOR = Histogram("vtt_real_time_factor", "Inference time divided by audio duration", ("model",),
+                             buckets=(0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0))
+# Running real-time factor per model for /stats: model -> [inference seconds, audio seconds]
+rtf_totals: Dict[str, List[float]] = {}
+http_in_flight = 0
+Gauge("vtt_http_in_flight", "HTTP requests being handled", lambda: {(): http_in_flight})
+Gauge("vtt_queue_depth", "Requests waiting for an inference worker",
+      lambda: {(): scheduler.queue_depth()["queue_depth"]} if scheduler is not None else {})
+Gauge("vtt_inference_in_flight", "Requests in batches being computed",
+      lambda: {(): scheduler.queue_depth()["in_flight"]} if scheduler is not None else {})
+Gauge("vtt_process_resident_memory_bytes", "Resident set size of the server process", lambda: {(): metrics.rss_bytes()})
+Gauge("vtt_ready", "1 once the default model is loaded and warmed up", lambda: {(): int(readiness["ready"])})
+Gauge("vtt_model_load_seconds", "Time it took to load each resident model",
+      lambda: {(m["name"],): m["load_time"] for m in registry.info()["models"]} if registry is not None else {},
+      ("model",))
+Gauge("vtt_jobs", "Jobs in each state", lambda: {(status,): count for status, count in jobs.counts().items()} if jobs is not None else {},
+      ("status",))
 
 def load_whisper_model(model_size: str = "large"):
     """Load Whisper model on GPU if available"""
-    global model
     device = "cuda" if torch.cuda.is_available() else "cpu"
     print(f"Loading Whisper {model_size} model on {device}...")
     
     model = whisper.load_model(model_size, device=device)
+    if device == "cpu" and CPU_MODE == "int8":
+        model = quantize_int8(model)
+        print("Applied dynamic int8 quantization to Linear layers")
     print(f"Model loaded successfully on {device}")
     return model
 
+def record_rtf(model_name: str, timings: Dict[str, float], audio_seconds: float):
+    """Track inference time relative to audio duration"""
+    inference_seconds = sum(timings.get(stage, 0.0) for stage in ("mel", "encoder", "decoder", "fallback", "transcribe"))
+    if audio_seconds <= 0 or inference_seconds <= 0:
+        return
+    REAL_TIME_FACTOR.observe(inference_seconds / audio_seconds, model_name)
+    totals = rtf_totals.setdefault(model_name, [0.0, 0.0])
+    totals[0] += inference_seconds
+    totals[1] += audio_seconds
+
+def warm_up(loop: asyncio.AbstractEventLoop):
+    """Load the default model and run a warmup transcription (background thread)"""
+    global process_backend
+    try:
+        readiness["stage"] = "loading"
+        entry = registry.get(DEFAULT_MODEL)
+        readiness["load_seconds"] = round(entry.load_time, 2)
+        
+        if USE_PROCESS_BACKEND:
+            # Fork before the parent ever runs a forward pass, and warm up inside each worker instead
+            readiness["stage"] = "forking"
+            started = time.perf_counter()
+            threads = CPU_THREADS or max(1, available_cores() // PROCESS_WORKERS)
+            backend = ProcessBackend({DEFAULT_MODEL: entry.model}, PROCESS_WORKERS, threads, WARMUP_SECONDS, SHORT_CLIP_SECONDS)
+            forked = backend.start()
+            process_backend = backend
+            print(f"Forked {forked} inference worker(s) with {threads} thread(s) each")
+            if WARMUP_SECONDS > 0:
+                readiness["warmup_seconds"] = round(time.perf_counter() - started, 2)
+                readiness["warmup_rtf"] = round(readiness["warmup_seconds"] / WARMUP_SECONDS, 3)
+        elif WARMUP_SECONDS > 0:
+            # The first forward pass pays for CUDA/CPU kernel init; make sure no user request does
+            readiness["stage"] = "warming_up"
+            started = time.perf_counter()
+            with registry.acquire(DEFAULT_MODEL) as entry:
+                transcribe_batch(entry.model, [warmup_audio(WARMUP_SECONDS)], lock=entry.lock, fallback=False)
+            readiness["warmup_seconds"] = round(time.perf_counter() - started, 2)
+            readiness["warmup_rtf"] = round(readiness["warmup_seconds"] / WARMUP_SECONDS, 3)
+        
+        readiness.update(ready=True, stage="ready")
+        if readiness["warmup_seconds"] is None:
+            print(f"Server ready: model load {readiness['load_seconds']}s, warmup disabled")
+        else:
+            print(f"Server ready: model load {readiness['load_seconds']}s, warmup {readiness['warmup_seconds']}s "
+                  f"(real-time factor {readiness['warmup_rtf']})")
+    except Exception as e:
+        readiness.update(stage="failed", error=str(e))
+        print(f"Startup failed: {e}")
+    finally:
+        fork_done.set()
+        loop.call_soon_threadsafe(ready_event.set)
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize model on server startup"""
-    # Use 'turbo' model for faster processing on 12GB GPU
-    load_whisper_model("turbo")
+    global registry, scheduler, cache, jobs, sessions, profiles, job_wakeup, ready_event
+    if not torch.cuda.is_available():
+        threads = configure_threads(CPU_THREADS, CPU_INTEROP_THREADS)
+        print(f"CPU inference ({CPU_MODE}): {threads['intra_op_threads']} intra-op / {threads['inter_op_threads']} inter-op threads")
+    registry = ModelRegistry(load_whisper_model, int(MODEL_MEMORY_MB * 1024 * 1024))
+    ready_event = asyncio.Event()
+    # Load and warm up in the background so /ready can report progress meanwhile
+    threading.Thread(target=warm_up, args=(asyncio.get_running_loop(),), daemon=True).start()
+    
+    cache = TranscriptionCache(CACHE_MAX_ENTRIES, int(CACHE_MAX_MB * 1024 * 1024), CACHE_DB)
+    sessions = SessionStore(SESSION_IDLE_SECONDS, SESSION_MAX)
+    print("Upload codecs: " + ", ".join(f"{codec} ({how})" for codec, how in supported_codecs().items()))
+    
+    scheduler = BatchScheduler(
+        run_batch,
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS,
+        workers=SCHEDULER_WORKERS,
+        max_queue_size=MAX_QUEUE_SIZE,
+        aging_seconds=PRIORITY_AGING_SECONDS,
+        reserved_slots=QUEUE_RESERVED_SLOTS
+    )
+    scheduler.start()
+    
+    jobs = JobStore(JOBS_DIR)
+    requeued = jobs.requeue_running()
+    if requeued:
+        print(f"Requeued {requeued} job(s) interrupted by the last shutdown")
+    job_wakeup = asyncio.Event()
+    job_workers.extend(asyncio.ensure_future(job_worker()) for _ in range(JOB_WORKERS))
+    
+    if PROFILING_ENABLED:
+        profiles = ProfileStore(PROFILES_DIR, PROFILES_MAX)
+        print(f"Request profiling enabled (X-Profile header), traces kept in {PROFILES_DIR}/")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the job workers, the batching thread and any inference processes"""
+    # Jobs cut off here stay 'running' in the database and are requeued on the next start
+    for worker in job_workers:
+        worker.cancel()
+    if scheduler is not None:
+        scheduler.stop()
+    if process_backend is not None:
+        process_backend.shutdown()
+
+async def job_worker():
+    """Background loop: claim queued jobs and run them one at a time"""
+    await ready_event.wait()
+    while True:
+        # Clear before claiming so a job queued in between still wakes us up
+        job_wakeup.clear()
+        job = await run_in_threadpool(jobs.claim)
+        if job is None:
+            await job_wakeup.wait()
+            continue
+        
+        task = asyncio.ensure_future(run_job(job))
+        running_jobs[job["id"]] = task
+        try:
+            await task
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                raise  # the worker itself is shutting down
+        finally:
+            running_jobs.pop(job["id"], None)
+
+async def run_job(job: Dict[str, Any]):
+    """Transcribe a job's spooled upload and store the outcome"""
+    job_id, options = job["id"], job["options"]
+    try:
+        content = await run_in_threadpool(jobs.load_audio, job_id)
+        request = TranscriptionRequest(
+            job["model"], options.get("vad", VAD_ENABLED), options.get("split", SPLIT_LONG_AUDIO),
+            on_progress=lambda done, total: run_in_threadpool(jobs.set_progress, job_id, done / total),
+            wait_for_room=True, priority="batch", client=options.get("client"),
+            preset=options.get("preset", DEFAULT_PRESET), language=options.get("language")
+        )
+        result = await transcribe_content(content, request, StageTimer())
+        # Serializing a long result and the SQLite writes stay off the event loop
+        await run_in_threadpool(jobs.finish, job_id, result=result)
+    except Exception as e:
+        # Some failures (a bare AssertionError, a timeout) have no message; the job still has to end up failed
+        await run_in_threadpool(jobs.finish, job_id, error=str(e) or repr(e))
+
+def run_batch(tasks: List[TranscriptionTask]) -> List[Any]:
+    """Scheduler callback: one batched forward pass per model in the batch"""
+    if USE_PROCESS_BACKEND:
+        fork_done.wait()
+    results: List[Any] = [None] * len(tasks)
+    groups: Dict[tuple, List[int]] = {}
+    for i, task in enumerate(tasks):
+        task.timings["queue"] = time.perf_counter() - task.submitted
+        QUEUE_WAIT_SECONDS.observe(task.timings["queue"], task.priority)
+        groups.setdefault(task.group_key(), []).append(i)
+    
+    for (model_name, preset, language, prompt), indices in groups.items():
+        audios = [tasks[i].audio for i in indices]
+        timings = [tasks[i].timings for i in indices]
+        try:
+            if process_backend is not None and process_backend.serves(model_name):
+                # Computed in a forked worker; this thread only waits for it
+                outputs = process_backend.transcribe(model_name, audios, timings, preset, language, prompt)
+            else:
+                # Requests pin (and if need be load) their model before queueing, so this thread never loads one
+                with registry.acquire(model_name, load=False) as entry:
+                    outputs = transcribe_batch(entry.model, audios, lock=entry.lock, timings=timings,
+                                               short_clip_seconds=SHORT_CLIP_SECONDS,
+                                               preset=PRESETS[preset], language=language, prompt=prompt)
+        except Exception as e:
+            outputs = [e] * len(indices)
+        for i, output in zip(indices, outputs):
+            results[i] = output
+    return results
+
+def prepare_audio(content: bytes, use_vad: bool, timer: StageTimer):
+    """Decode an upload and trim its silence; returns (audio, offset seconds, speech ratio)"""
+    with timer.stage("decode"):
+        # 16 kHz PCM WAVs are parsed in memory; anything else is piped through ffmpeg
+        audio_array = decode_audio(content)
+    if not use_vad:
+        return audio_array, 0.0, None
+    with timer.stage("vad"):
+        trimmed, offset, vad = trim_silence(audio_array, VAD_PADDING_MS, VAD_MIN_SPEECH_MS)
+    return trimmed, offset, round(vad.speech_ratio, 3)
+
+def shift_segments(segments: List[Dict[str, Any]], offset: float) -> List[Dict[str, Any]]:
+    """Move segment timestamps from the trimmed clip back onto the original upload's timeline"""
+    if not offset:
+        return segments
+    return [
+        {**segment, "start": round(segment["start"] + offset, 2), "end": round(segment["end"] + offset, 2)}
+        for segment in segments
+    ]
+
+def request_identity(connection: HTTPConnection, default_priority: str) -> Tuple[str, str]:
+    """Scheduling class (X-Priority) and client identity (X-Client-Id, else the peer address) of a request"""
+    priority = connection.headers.get("x-priority", default_priority).strip().lower()
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"X-Priority must be one of: {', '.join(PRIORITIES)}")
+    client = connection.headers.get("x-client-id") or (connection.client.host if connection.client else "")
+    return priority, client
+
+def resolve_preset(connection: HTTPConnection, name: Optional[str], priority: str) -> str:
+    """Decode preset named by the request (query, else X-Decode-Preset), else the default for its class"""
+    name = name or connection.headers.get("x-decode-preset")
+    if not name:
+        return STREAMING_PRESET if priority == "streaming" else DEFAULT_PRESET
+    name = name.strip().lower()
+    if name not in PRESETS:
+        raise HTTPException(status_code=400, detail=f"Unknown decode preset '{name}'. Available: {', '.join(PRESETS)}")
+    return name
+
+def resolve_language(name: Optional[str]) -> Optional[str]:
+    """Validate a fixed language (code or English name); None leaves detection to the model"""
+    if not name:
+        return None
+    code = TO_LANGUAGE_CODE.get(name.strip().lower(), name.strip().lower())
+    if code not in LANGUAGES:
+        raise HTTPException(status_code=400, detail=f"Unknown language '{name}'")
+    return code
+
+def open_session(connection: HTTPConnection) -> Optional[TranscriptionSession]:
+    """The session named by an X-Session-Id header, if any"""
+    session_id = connection.headers.get("x-session-id", "").strip()
+    if not session_id:
+        return None
+    if len(session_id) > 128:
+        raise HTTPException(status_code=400, detail="X-Session-Id must be at most 128 characters")
+    return sessions.open(session_id)
+
+def resolve_model(name: Optional[str]) -> str:
+    """Validate a requested model name, defaulting to DEFAULT_MODEL"""
+    if not name:
+        return DEFAULT_MODEL
+    if name not in ModelRegistry.available():
+        raise HTTPException(status_code=400, detail=f"Unknown model '{name}'. Available: {', '.join(ModelRegistry.available())}")
+    return name
+
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    """Count requests and measure their latency for /metrics"""
+    global http_in_flight
+    http_in_flight += 1
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        http_in_flight -= 1
+        # Label by route template so /jobs/<id>-style paths (and scanners probing random URLs) don't explode the series count
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        REQUESTS.inc(path, str(status))
+        REQUEST_SECONDS.observe(time.perf_counter() - started, path)
 
 @app.get("/")
 async def root():
     """Health check endpoint"""
     return {
         "status": "running",
-        "model_loaded": model is not None,
+        "model_loaded": registry is not None and registry.is_loaded(DEFAULT_MODEL),
+        "ready": readiness["ready"],
         "device": "cuda" if torch.cuda.is_available() else "cpu",
-        "gpu_available": torch.cuda.is_available()
+        "gpu_available": torch.cuda.is_available(),
+        **(scheduler.queue_depth() if scheduler is not None else {})
     }
 
+@app.get("/ready")
+async def ready(response: Response, wait: float = Query(0, ge=0)):
+    """Readiness probe: 200 once the default model is loaded and warm; ?wait=N long-polls up to N seconds"""
+    if not readiness["ready"] and wait > 0 and ready_event is not None:
+        try:
+            await asyncio.wait_for(ready_event.wait(), timeout=min(wait, MAX_READY_WAIT))
+        except asyncio.TimeoutError:
+            pass
+    
+    if not readiness["ready"]:
+        response.status_code = 503
+        response.headers["Retry-After"] = "1"
+    return readiness
+
 @app.post("/transcribe")
-async def transcribe_audio(audio: UploadFile = File(...)):
-    """Transcribe uploaded audio file"""
-    if model is None:
+async def transcribe_audio(
+    http_request: Request,
+    audio: UploadFile = File(...),
+    model_form: Optional[str] = Form(None, alias="model"),
+    model_query: Optional[str] = Query(None, alias="model"),
+    vad: Optional[bool] = Query(None),
+    split: Optional[bool] = Query(None),
+    fields: Literal["text", "segments", "full"] = Query("full"),
+    stream: bool = Query(False),
+    preset: Optional[str] = Query(None),
+    language: Optional[str] = Query(None)
+):
+    """Transcribe uploaded audio file; stream=1 returns segments as NDJSON lines as soon as they are decoded"""
+    if registry is None or scheduler is None:
         raise HTTPException(status_code=500, detail="Model not loaded")
     
     if not audio.content_type.startswith('audio/'):
         raise HTTPException(status_code=400, detail="File must be audio format")
     
+    model_name = resolve_model(model_form or model_query)
+    priority, client = request_identity(http_request, "interactive")
+    preset = resolve_preset(http_request, preset, priority)
+    language = resolve_language(language)
+    # Chunks of one session keep the first chunk's language and continue from the previous chunk's text
+    session = open_session(http_request)
+    if session is not None and language is None:
+        language = session.language
+    
+    profilers = None
+    if profiles is not None and "x-profile" in http_request.headers:
+        try:
+            profilers = parse_profilers(http_request.headers["x-profile"])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if stream:
+            raise HTTPException(status_code=400, detail="X-Profile cannot be combined with stream=1")
+    
+    timer = StageTimer()
+    started = time.perf_counter()
     try:
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_file:
+        with timer.stage("read"):
             content = await audio.read()
-            tmp_file.write(content)
-            tmp_file_path = tmp_file.name
+        request = TranscriptionRequest(
+            model_name, VAD_ENABLED if vad is None else vad, SPLIT_LONG_AUDIO if split is None else split,
+            priority=priority, client=client, preset=preset, language=language,
+            prompt=session.prompt if session is not None else None, session=session, progressive=stream
+        )
+        if stream:
+            # Decode up front so a bad upload still gets a proper 400 instead of an in-band error
+            audio_array, offset, speech_ratio = await run_in_threadpool(prepare_audio, content, request.use_vad, timer)
+            return StreamingResponse(
+                stream_transcription(audio_array, offset, speech_ratio, request, fields, timer, started),
+                media_type="application/x-ndjson",
+                # Opt out of gzip, whose compressor would hold lines back until it has a full block
+                headers={"Content-Encoding": "identity"}
+            )
         
-        # Transcribe with Whisper
-        result = model.transcribe(tmp_file_path)
+        profile_id = None
+        if profilers:
+            # One thread, off the scheduler and cache, so the trace covers exactly this audio
+            result, profile_id = await run_in_threadpool(
+                profiles.run, profilers, f"/transcribe {audio.filename} ({model_name})",
+                transcribe_profiled, content, request, timer
+            )
+        else:
+            result = await transcribe_content(content, request, timer)
+        if session is not None:
+            sessions.record(session, result)
+        with timer.stage("encode"):
+            response = encode_response(select_fields(result, fields), http_request)
+        finish_timing(timer, started, response)
+        if profile_id is not None:
+            response.headers["X-Profile-Id"] = profile_id
+        return response
+    
+    except AudioDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+
+@app.post("/transcribe/batch")
+async def transcribe_audio_batch(
+    http_request: Request,
+    audio: List[UploadFile] = File(...),
+    model_form: Optional[str] = Form(None, alias="model"),
+    model_query: Optional[str] = Query(None, alias="model"),
+    vad: Optional[bool] = Query(None),
+    split: Optional[bool] = Query(None),
+    fields: Literal["text", "segments", "full"] = Query("full"),
+    preset: Optional[str] = Query(None),
+    language: Optional[str] = Query(None)
+):
+    """Transcribe several uploaded files in one request; results come back in upload order"""
+    if registry is None or scheduler is None:
+        raise HTTPException(status_code=500, detail="Model not loaded")
+    
+    if len(audio) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_FILES} files per batch request")
+    
+    model_name = resolve_model(model_form or model_query)
+    priority, client = request_identity(http_request, "batch")
+    preset = resolve_preset(http_request, preset, priority)
+    language = resolve_language(language)
+    # One request for all files: they are queued together, so the scheduler stacks them into shared forward passes
+    request = TranscriptionRequest(
+        model_name, VAD_ENABLED if vad is None else vad, SPLIT_LONG_AUDIO if split is None else split,
+        priority=priority, client=client, preset=preset, language=language
+    )
+    
+    timer = StageTimer()
+    started = time.perf_counter()
+    
+    async def run_item(upload: UploadFile) -> Dict[str, Any]:
+        if not upload.content_type.startswith('audio/'):
+            raise HTTPException(status_code=400, detail="File must be audio format")
+        content = await upload.read()
+        # Per-file stage times overlap, so only the request as a whole is timed
+        return await transcribe_content(content, request, StageTimer())
+    
+    with timer.stage("items"):
+        outcomes = await asyncio.gather(*(run_item(upload) for upload in audio), return_exceptions=True)
+    
+    results = []
+    for index, (upload, outcome) in enumerate(zip(audio, outcomes)):
+        item = {"index": index, "filename": upload.filename}
+        if isinstance(outcome, Exception):
+            status, detail = error_status(outcome)
+            item.update(status=status, error=detail)
+        else:
+            item.update(status=200, **select_fields(outcome, fields))
+        results.append(item)
+    
+    with timer.stage("encode"):
+        response = encode_response({"model": model_name, "results": results}, http_request)
+    finish_timing(timer, started, response)
+    return response
+
+def select_fields(body: Dict[str, Any], fields: str) -> Dict[str, Any]:
+    """Trim a transcription to what the client asked for: text, text plus segment timings, or everything"""
+    if fields == "text":
+        return {key: body[key] for key in ("text", "language", "model", "preset", "fallbacks") if key in body}
+    if fields == "segments":
+        # Drop token ids and decoder statistics, which no client reads
+        segments = [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in body.get("segments", [])]
+        return {**body, "segments": segments}
+    return body
+
+def encode_response(body: Dict[str, Any], http_request: Request) -> Response:
+    """Serialize a response as msgpack when the client accepts it, JSON otherwise"""
+    # Returning a Response directly also skips FastAPI's jsonable_encoder pass over the body
+    if msgpack is not None and "application/msgpack" in http_request.headers.get("accept", ""):
+        return Response(msgpack.packb(body), media_type="application/msgpack")
+    return JSONResponse(body)
+
+def error_status(error: Exception) -> Tuple[int, str]:
+    """HTTP status and message for a failure, matching what /transcribe would have responded"""
+    if isinstance(error, HTTPException):
+        return error.status_code, error.detail
+    if isinstance(error, AudioDecodeError):
+        return 400, str(error)
+    if isinstance(error, QueueFullError):
+        return 503, str(error)
+    return 500, f"Transcription failed: {str(error)}"
+
+class TranscriptionRequest:
+    """Per-request settings shared by every clip (or chunk) the request queues"""
+    def __init__(self, model_name: str, use_vad: bool, use_split: bool,
+                 on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None, wait_for_room: bool = False,
+                 priority: str = "interactive", client: Optional[str] = None,
+                 preset: str = DEFAULT_PRESET, language: Optional[str] = None,
+                 prompt: Optional[str] = None, session: Optional[TranscriptionSession] = None,
+                 progressive: bool = False):
+        self.model_name = model_name
+        self.use_vad = use_vad
+        self.use_split = use_split
+        self.on_progress = on_progress  # awaited with (chunks done, chunk count) for split audio
+        self.wait_for_room = wait_for_room  # wait out a full queue instead of failing (background work)
+        self.priority = priority
+        self.client = client
+        self.preset = preset
+        self.language = language  # fixed language code, or None to detect it
+        self.prompt = prompt  # text the decoder continues from
+        self.session = session  # updated with the result by the endpoint
+        self.progressive = progressive  # streamed: earlier chunks are decoded before later ones
+        # Caps how many of this request's clips sit in the scheduler queue at once
+        self.slots = asyncio.Semaphore(STREAM_MAX_IN_FLIGHT if progressive else SPLIT_MAX_IN_FLIGHT)
+
+async def transcribe_content(content: bytes, request: TranscriptionRequest, timer: StageTimer) -> Dict[str, Any]:
+    """Decode, trim and transcribe one upload; returns the response body"""
+    audio_array, offset, speech_ratio = await run_in_threadpool(prepare_audio, content, request.use_vad, timer)
+    if request.use_vad and len(audio_array) == 0:
+        # Nothing but silence: skip inference (and Whisper's habit of hallucinating on it)
+        result = {"text": "", "language": "unknown", "segments": []}
+    else:
+        result = await transcribe_cached(audio_array, request, timer)
+    return format_result(result, request, offset, speech_ratio)
+
+async def transcribe_cached(audio_array, request: TranscriptionRequest, timer: StageTimer) -> Dict[str, Any]:
+    """Serve a clip from the cache, or transcribe it (in chunks when long) and cache the result"""
+    parts = [part async for part in transcribe_parts(audio_array, request, timer)]
+    if len(parts) == 1 and parts[0][0] == 0.0:
+        return parts[0][1]
+    return stitch_results([result for _, result in parts], [offset for offset, _ in parts])
+
+async def transcribe_parts(audio_array, request: TranscriptionRequest,
+                           timer: StageTimer) -> AsyncIterator[Tuple[float, Dict[str, Any]]]:
+    """Serve a clip from the cache or transcribe it, yielding (offset seconds, result) per chunk, in order, as each is ready"""
+    chunk_seconds = STREAM_FIRST_CHUNK_SECONDS if request.progressive else SPLIT_CHUNK_SECONDS
+    split = request.use_split and len(audio_array) > chunk_seconds * SAMPLE_RATE
+    # Retries and re-uploads of the same audio are served from the cache; hashing a long upload and the
+    # disk store are blocking work, kept off the event loop
+    with timer.stage("cache"):
+        # Chunked and sequential transcriptions of the same audio differ, so how it is split is part of the key
+        chunking = ("stream" if request.progressive else "window") if split else None
+        cache_key = await run_in_threadpool(
+            make_key, audio_array, request.model_name,
+            {"preset": request.preset, "language": request.language, "prompt": request.prompt, "split": chunking}
+        )
+        result = await run_in_threadpool(cache.get, cache_key)
+    while result is None:
+        # ...or, while the original is still being computed, share its result
+        in_flight = cache.begin(cache_key)
+        if in_flight is None:
+            break
+        with timer.stage("coalesced"):
+            # Shielded: one waiter going away must not cancel the result for the others
+            result = await asyncio.shield(asyncio.wrap_future(in_flight))
+    if result is not None:
+        yield 0.0, result
+        return
+    
+    try:
+        if split:
+            with timer.stage("split"):
+                if request.progressive:
+                    bounds = await run_in_threadpool(split_for_streaming, audio_array, request.use_vad)
+                else:
+                    bounds = await run_in_threadpool(
+                        split_at_silence, audio_array, SPLIT_CHUNK_SECONDS, VAD_MIN_SPEECH_MS, request.use_vad
+                    )
+            # Chunks overlap, so their per-stage times would add up to more than the wall clock; report the whole phase instead
+            results = []
+            with timer.stage("chunks"):
+                async for offset, result in iter_chunks(audio_array, bounds, request):
+                    results.append(result)
+                    yield offset, result
+            result = stitch_results(results, [start / SAMPLE_RATE for start, _ in bounds])
+        else:
+            # Transcribe with Whisper, batched with whatever else arrives in the same window
+            result = await run_task(audio_array, request, timer)
+            yield 0.0, result
+        await run_in_threadpool(cache.put, cache_key, result)
+    finally:
+        # Identical requests that queued up behind a failed or abandoned attempt compute it themselves
+        cache.end(cache_key)
+
+def split_for_streaming(audio_array, drop_silent: bool) -> List[Tuple[int, int]]:
+    """Chunk bounds for stream=1: a short first chunk, so the first words come back quickly, then full windows"""
+    window = int(SPLIT_CHUNK_SECONDS * SAMPLE_RATE)
+    # VAD has already trimmed leading silence, so the first chunk is kept even if it is quiet
+    _, first_end = split_at_silence(audio_array[:window], STREAM_FIRST_CHUNK_SECONDS, VAD_MIN_SPEECH_MS, False)[0]
+    if first_end >= len(audio_array):
+        return [(0, len(audio_array))]
+    rest = split_at_silence(audio_array[first_end:], SPLIT_CHUNK_SECONDS, VAD_MIN_SPEECH_MS, drop_silent)
+    return [(0, first_end)] + [(first_end + start, first_end + end) for start, end in rest if end > start]
+
+def transcribe_profiled(content: bytes, request: TranscriptionRequest, timer: StageTimer) -> Dict[str, Any]:
+    """The /transcribe pipeline run synchronously in the calling thread, without the cache or other requests' batches"""
+    audio_array, offset, speech_ratio = prepare_audio(content, request.use_vad, timer)
+    if request.use_vad and len(audio_array) == 0:
+        return format_result({"text": "", "language": "unknown", "segments": []}, request, offset, speech_ratio)
+    
+    bounds = [(0, len(audio_array))]
+    if request.use_split and len(audio_array) > SPLIT_CHUNK_SECONDS * SAMPLE_RATE:
+        with timer.stage("split"):
+            bounds = split_at_silence(audio_array, SPLIT_CHUNK_SECONDS, VAD_MIN_SPEECH_MS, request.use_vad)
+    clips = [audio_array[start:end] for start, end in bounds]
+    timings: List[Dict[str, float]] = [{} for _ in clips]
+    results: List[Dict[str, Any]] = []
+    with timer.stage("chunks") if len(bounds) > 1 else contextlib.nullcontext():
+        with registry.acquire(request.model_name) as entry:
+            for first in range(0, len(clips), BATCH_MAX_SIZE):
+                batch = slice(first, first + BATCH_MAX_SIZE)
+                results += transcribe_batch(entry.model, clips[batch], lock=entry.lock, timings=timings[batch],
+                                            short_clip_seconds=SHORT_CLIP_SECONDS,
+                                            preset=PRESETS[request.preset], language=request.language,
+                                            prompt=request.prompt)
+    if len(bounds) == 1:
+        timer.update(timings[0])
+        return format_result(results[0], request, offset, speech_ratio)
+    result = stitch_results(results, [start / SAMPLE_RATE for start, _ in bounds])
+    return format_result(result, request, offset, speech_ratio)
+
+def format_result(result: Dict[str, Any], request: TranscriptionRequest, offset: float,
+                  speech_ratio: Optional[float]) -> Dict[str, Any]:
+    """Response body for a transcription, on the original upload's timeline"""
+    return {
+        "text": result["text"].strip(),
+        "language": result.get("language", "unknown"),
+        "model": request.model_name,
+        "preset": result.get("preset", request.preset),
+        "fallbacks": result.get("fallbacks", 0),
+        "segments": shift_segments(result.get("segments", []), offset),
+        "speech_ratio": speech_ratio
+    }
+
+async def run_task(audio_array, request: TranscriptionRequest, timer: Optional[StageTimer]) -> Dict[str, Any]:
+    """Queue one clip on the scheduler and record its stage timings"""
+    task = TranscriptionTask(audio_array, request.model_name, request.priority, request.client,
+                             request.preset, request.language, request.prompt)
+    # Loading a model that isn't resident happens here, off the scheduler's inference threads
+    entry = await run_in_threadpool(registry.pin, request.model_name)
+    try:
+        async with request.slots:
+            while True:
+                try:
+                    future = scheduler.submit(task, task.priority, task.client)
+                    break
+                except QueueFullError as e:
+                    # Background work waits its turn instead of failing
+                    if not request.wait_for_room:
+                        raise
+                    await asyncio.sleep(e.retry_after)
+            result = await asyncio.wrap_future(future)
+    finally:
+        registry.unpin(entry)
+    if timer is not None:
+        timer.update(task.timings)
+    record_rtf(request.model_name, task.timings, len(audio_array) / SAMPLE_RATE)
+    if result.get("fallbacks"):
+        FALLBACKS.inc(task.preset, amount=result["fallbacks"])
+    return result
+
+async def iter_chunks(audio_array, bounds: List[Tuple[int, int]],
+                      request: TranscriptionRequest) -> AsyncIterator[Tuple[float, Dict[str, Any]]]:
+    """Queue the chunks (the first one alone for streamed requests) and yield (offset seconds, result) in order as each finishes"""
+    done = 0
+    
+    async def run_chunk(start: int, end: int) -> Dict[str, Any]:
+        nonlocal done
+        result = await run_task(audio_array[start:end], request, None)
+        done += 1
+        if request.on_progress is not None:
+            await request.on_progress(done, len(bounds))
+        return result
+    
+    tasks = [asyncio.ensure_future(run_chunk(*bounds[0]))]
+    if not request.progressive:
+        tasks += [asyncio.ensure_future(run_chunk(start, end)) for start, end in bounds[1:]]
+    try:
+        yield bounds[0][0] / SAMPLE_RATE, await tasks[0]
+        if request.progressive:
+            # Queued only now, so the first chunk never waits in a batch with the rest of the upload
+            tasks += [asyncio.ensure_future(run_chunk(start, end)) for start, end in bounds[1:]]
+        for (start, _), task in zip(bounds[1:], tasks[1:]):
+            yield start / SAMPLE_RATE, await task
+    finally:
+        # A chunk failed or the client went away: don't leave the rest queued
+        for task in tasks:
+            task.cancel()
+
+async def stream_transcription(audio_array, offset: float, speech_ratio: Optional[float], request: TranscriptionRequest,
+                               fields: str, timer: StageTimer, started: float) -> AsyncIterator[bytes]:
+    """NDJSON body: one line per segment as soon as its chunk is decoded, then a summary line"""
+    results, offsets = [], []
+    count = 0
+    try:
+        if not (request.use_vad and len(audio_array) == 0):
+            async for chunk_offset, result in transcribe_parts(audio_array, request, timer):
+                results.append(result)
+                offsets.append(chunk_offset)
+                for segment in shift_segments(result.get("segments", []), offset + chunk_offset):
+                    segment = {**segment, "id": count}
+                    if fields != "full":
+                        segment = {"id": count, "start": segment["start"], "end": segment["end"], "text": segment["text"]}
+                    count += 1
+                    yield ndjson_line({"type": "segment", **segment})
         
-        # Clean up temp file
-        os.unlink(tmp_file_path)
+        summary = results[0] if len(results) == 1 else stitch_results(results, offsets)
+        if request.session is not None:
+            sessions.record(request.session, summary)
+        yield ndjson_line({
+            "type": "done",
+            "text": summary.get("text", "").strip(),
+            "language": summary.get("language", "unknown"),
+            "model": request.model_name,
+            "preset": summary.get("preset", request.preset),
+            "fallbacks": summary.get("fallbacks", 0),
+            "segments": count,
+            "speech_ratio": speech_ratio
+        })
+    except Exception as e:
+        # Headers are long gone; report the failure in-band
+        status, detail = error_status(e)
+        yield ndjson_line({"type": "error", "status": status, "detail": detail})
+    finally:
+        timer.add("total", time.perf_counter() - started)
+        timer.observe(STAGE_SECONDS)
+
+def ndjson_line(body: Dict[str, Any]) -> bytes:
+    """Encode one line of an NDJSON stream"""
+    return (json.dumps(body, ensure_ascii=False) + "\n").encode("utf-8")
+
+def finish_timing(timer: StageTimer, started: float, response: Response):
+    """Record stage histograms and attach the Server-Timing header"""
+    timer.add("total", time.perf_counter() - started)
+    timer.observe(STAGE_SECONDS)
+    response.headers["Server-Timing"] = timer.server_timing()
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    http_request: Request,
+    audio: UploadFile = File(...),
+    model_form: Optional[str] = Form(None, alias="model"),
+    model_query: Optional[str] = Query(None, alias="model"),
+    vad: Optional[bool] = Query(None),
+    split: Optional[bool] = Query(None),
+    preset: Optional[str] = Query(None),
+    language: Optional[str] = Query(None)
+):
+    """Queue an upload for background transcription; poll GET /jobs/{id} for progress and the result"""
+    if jobs is None:
+        raise HTTPException(status_code=500, detail="Job queue not initialized")
+    
+    if not audio.content_type.startswith('audio/'):
+        raise HTTPException(status_code=400, detail="File must be audio format")
+    
+    model_name = resolve_model(model_form or model_query)
+    options = {key: value for key, value in (("vad", vad), ("split", split)) if value is not None}
+    # Jobs always run in the batch class; the client id keeps one submitter's backlog from starving the others
+    _, options["client"] = request_identity(http_request, "batch")
+    options["preset"] = resolve_preset(http_request, preset, "batch")
+    options["language"] = resolve_language(language)
+    # Spooling a large upload and the insert are blocking I/O, kept off the event loop
+    job_id = await run_in_threadpool(jobs.create, await audio.read(), audio.filename, model_name, options)
+    job_wakeup.set()
+    return {"id": job_id, "status": "queued", "url": f"/jobs/{job_id}"}
+
+@app.get("/jobs")
+async def list_jobs(status: Optional[str] = None, limit: int = Query(100, ge=1, le=1000)):
+    """Most recent jobs, optionally filtered by status"""
+    if jobs is None:
+        raise HTTPException(status_code=500, detail="Job queue not initialized")
+    return {"jobs": jobs.recent(status, limit), "counts": jobs.counts()}
+
+@app.get("/jobs/{job_id}")
+async def get_job(http_request: Request, job_id: str, fields: Literal["text", "segments", "full"] = Query("full")):
+    """Status, progress (0-1) and, once completed, the transcription of a job"""
+    job = jobs.get(job_id) if jobs is not None else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["result"] is not None:
+        job["result"] = select_fields(job["result"], fields)
+    return encode_response(job, http_request)
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job; finished jobs are left as they are"""
+    status = jobs.cancel(job_id) if jobs is not None else None
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    task = running_jobs.get(job_id)
+    if task is not None:
+        task.cancel()
+    return jobs.get(job_id)
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    """Pinned language, carried prompt and chunk count of a streaming session"""
+    session = sessions.get(session_id) if sessions is not None else None
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return session.info()
+
+@app.delete("/sessions/{session_id}", status_code=204)
+async def close_session(session_id: str):
+    """End a session, so its next chunk starts over with language detection and no prompt"""
+    if sessions is None or not sessions.close(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return Response(status_code=204)
+
+@app.get("/profiles")
+async def list_profiles():
+    """Stored request profiles, newest first"""
+    if profiles is None:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (set VTT_PROFILING_ENABLED=1)")
+    return {"profiles": await run_in_threadpool(profiles.recent)}
+
+@app.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    """Profile metadata and download links for its files"""
+    profile = profiles.get(profile_id) if profiles is not None else None
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return {**profile, "downloads": {kind: f"/profiles/{profile_id}/{kind}" for kind in profile["files"]}}
+
+@app.get("/profiles/{profile_id}/{kind}")
+async def download_profile(profile_id: str, kind: Literal["pstats", "trace", "summary"]):
+    """pstats dump (cProfile), Chrome trace JSON (torch.profiler) or text summary of a profile"""
+    profile = profiles.get(profile_id) if profiles is not None else None
+    if profile is None or kind not in profile["files"]:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    suffix, media_type = ARTIFACTS[kind]
+    return FileResponse(profiles.path(profile_id, kind), media_type=media_type, filename=profile_id + suffix)
+
+@app.websocket("/ws/transcribe")
+async def transcribe_stream(websocket: WebSocket, model: Optional[str] = None, preset: Optional[str] = None,
+                            language: Optional[str] = None):
+    """Stream raw 16 kHz mono s16le PCM in binary frames; send {"type": "stop"} to finish"""
+    await websocket.accept()
+    if registry is None or scheduler is None:
+        await websocket.close(code=1013, reason="Model not loaded")
+        return
+    if model and model not in ModelRegistry.available():
+        await websocket.close(code=1008, reason=f"Unknown model '{model}'")
+        return
+    model_name = model or DEFAULT_MODEL
+    client = websocket.headers.get("x-client-id") or (websocket.client.host if websocket.client else "")
+    try:
+        preset = resolve_preset(websocket, preset, "streaming")
+        language = resolve_language(language)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+    
+    session = StreamingSession(WS_DECODE_INTERVAL, WS_MAX_BUFFER_SECONDS)
+    entry = None
+    
+    try:
+        # Loaded (if need be) off the scheduler's threads, and kept resident for the whole connection
+        entry = await run_in_threadpool(registry.pin, model_name)
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            
+            if message.get("bytes"):
+                session.add_audio(message["bytes"])
+                if not session.ready():
+                    continue
+                if VAD_ENABLED and not detect_speech(session.buffer, VAD_MIN_SPEECH_MS).has_speech:
+                    # Nobody is talking: don't spend a decode on it, and don't let the silence pile up
+                    session.drop_silence()
+                    continue
+                try:
+                    # Settled language and already-trimmed committed text carry over between decodes
+                    task = TranscriptionTask(session.snapshot(), model_name, "streaming", client, preset,
+                                             language or session.settled_language(), session.context())
+                    result = await asyncio.wrap_future(scheduler.submit(task, task.priority, task.client))
+                except QueueFullError as e:
+                    # Skip this update; the next one re-decodes the whole buffer anyway
+                    await websocket.send_json({"type": "busy", "retry_after": e.retry_after})
+                    continue
+                for reply in session.apply(result):
+                    await websocket.send_json(reply)
+            
+            elif message.get("text"):
+                try:
+                    command = json.loads(message["text"]).get("type")
+                except (ValueError, AttributeError):
+                    command = message["text"].strip()
+                if command == "stop":
+                    break
         
-        return {
-            "text": result["text"].strip(),
-            "language": result.get("language", "unknown"),
-            "segments": result.get("segments", [])
-        }
+        result = {"text": "", "language": session.language}
+        if len(session.buffer):
+            task = TranscriptionTask(session.snapshot(), model_name, "streaming", client, preset,
+                                     language or session.settled_language(), session.context())
+            result = await asyncio.wrap_future(scheduler.submit(task, task.priority, task.client))
+        await websocket.send_json(session.finish(result))
+        await websocket.close()
     
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
-        # Clean up temp file on error
-        if 'tmp_file_path' in locals():
-            try:
-                os.unlink(tmp_file_path)
-            except:
-                pass
-        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+        await websocket.send_json({"type": "error", "detail": f"Transcription failed: {str(e)}"})
+        await websocket.close(code=1011)
+    finally:
+        if entry is not None:
+            registry.unpin(entry)
+
+@app.get("/stats")
+async def stats():
+    """Batching and cache statistics for tuning"""
+    return {
+        "batching": scheduler.stats() if scheduler is not None else None,
+        "cache": cache.stats() if cache is not None else None,
+        "jobs": jobs.counts() if jobs is not None else None,
+        "sessions": sessions.stats() if sessions is not None else None,
+        "real_time_factor": {
+            name: round(inference / audio, 3) for name, (inference, audio) in rtf_totals.items() if audio
+        }
+    }
+
+@app.get("/codecs")
+async def codecs():
+    """Upload codecs the server decodes, and how: in memory ('native', 'soundfile') or through an ffmpeg pipe"""
+    return {"codecs": supported_codecs(), "sample_rate": SAMPLE_RATE}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/model-info")
 async def model_info():
     """Get current model information"""
-    if model is None:
+    if registry is None:
         return {"model_loaded": False}
     
     return {
-        "model_loaded": True,
-        "device": str(model.device),
-        "model_size": getattr(model, 'model_size', 'unknown')
+        "model_loaded": registry.is_loaded(DEFAULT_MODEL),
+        "device": "cuda" if torch.cuda.is_available() else "cpu",
+        "model_size": DEFAULT_MODEL,
+        "available_models": ModelRegistry.available(),
+        "decode_presets": {"available": list(PRESETS), "default": DEFAULT_PRESET, "streaming": STREAMING_PRESET},
+        "process_backend": process_backend.info() if process_backend is not None else None,
+        **registry.info()
     }
 
 if __name__ == "__main__":
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Transcription sessions for chunked streaming
+Consecutive /transcribe calls sharing an X-Session-Id keep the language detected on the first chunk
+and prompt the decoder with the previous chunk's text
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Longest prompt carried between chunks; whisper keeps at most ~220 tokens of it anyway
+PROMPT_MAX_CHARS = 500
+
+class TranscriptionSession:
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.language: Optional[str] = None  # pinned once a chunk with speech has been detected
+        self.prompt: Optional[str] = None  # text of the last chunk with speech
+        self.chunks = 0
+        self.created = time.time()
+        self.last_used = time.monotonic()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "language": self.language,
+            "prompt": self.prompt,
+            "chunks": self.chunks,
+            "created": self.created,
+            "idle_seconds": round(time.monotonic() - self.last_used, 1)
+        }
+
+class SessionStore:
+    def __init__(self, idle_seconds: float = 300.0, max_sessions: int = 1000):
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[str, TranscriptionSession]" = OrderedDict()  # least recently used first
+        self.lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+
+    def open(self, session_id: str) -> TranscriptionSession:
+        """The live session with this id, starting a new one if it doesn't exist or has expired"""
+        with self.lock:
+            self.expire()
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = self.sessions[session_id] = TranscriptionSession(session_id)
+                self.created += 1
+                while len(self.sessions) > self.max_sessions:
+                    self.sessions.popitem(last=False)
+                    self.expired += 1
+            self.sessions.move_to_end(session_id)
+            session.last_used = time.monotonic()
+            return session
+
+    def record(self, session: TranscriptionSession, result: Dict[str, Any]):
+        """Pin the language and carry the text of a finished chunk into the next one"""
+        text = result.get("text", "").strip()
+        with self.lock:
+            session.chunks += 1
+            session.last_used = time.monotonic()
+            if session.id in self.sessions:
+                self.sessions.move_to_end(session.id)
+            if not text:
+                return  # a pause: keep the context from before it
+            if session.language is None and result.get("language") not in (None, "unknown"):
+                session.language = result["language"]
+            session.prompt = text[-PROMPT_MAX_CHARS:]
+
+    def get(self, session_id: str) -> Optional[TranscriptionSession]:
+        with self.lock:
+            self.expire()
+            return self.sessions.get(session_id)
+
+    def close(self, session_id: str) -> bool:
+        """End a session early; returns False if there was no such session"""
+        with self.lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def expire(self):
+        """Drop sessions idle for longer than idle_seconds (lock held)"""
+        cutoff = time.monotonic() - self.idle_seconds
+        while self.sessions:
+            session = next(iter(self.sessions.values()))
+            if session.last_used > cutoff:
+                break
+            self.sessions.popitem(last=False)
+            self.expired += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            self.expire()
+            return {
+                "active": len(self.sessions),
+                "created": self.created,
+                "expired": self.expired,
+                "idle_seconds": self.idle_seconds
+            }
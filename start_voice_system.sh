@@ -17,6 +17,7 @@ CLIENT_SESSION="voice_client"
 SERVER_SESSION="voice_server"
 MAX_RETRIES=30
 RETRY_INTERVAL=2
+READY_WAIT=10  # seconds each /ready request long-polls on the server
 
 # Colors for output
 RED='\033[0;31m'
@@ -70,9 +71,9 @@ check_prerequisites() {
         exit 1
     fi
 
-    # Check if nc (netcat) is available for port checking
-    if ! command -v nc >/dev/null 2>&1; then
-        log_error "netcat (nc) is not installed or not in PATH"
+    # Check if curl is available for readiness checks
+    if ! command -v curl >/dev/null 2>&1; then
+        log_error "curl is not installed or not in PATH"
         exit 1
     fi
 
@@ -108,24 +109,32 @@ start_server() {
     fi
 }
 
-# Wait for server to be ready
+# Wait for server to be ready (model loaded and warmed up, not just port open)
 wait_for_server() {
     log_info "Waiting for server to be ready on ${SERVER_HOST}:${SERVER_PORT}..."
 
     local retry_count=0
+    local ready_url="http://${SERVER_HOST}:${SERVER_PORT}/ready?wait=${READY_WAIT}"
 
     while [ $retry_count -lt $MAX_RETRIES ]; do
-        if nc -z "${SERVER_HOST}" "${SERVER_PORT}" 2>/dev/null; then
-            log_success "Server is ready!"
+        local body=""
+        local curl_status=0
+        body=$(curl -sf --max-time $((READY_WAIT + 5)) "${ready_url}" 2>/dev/null) || curl_status=$?
+
+        if [ $curl_status -eq 0 ]; then
+            log_success "Server is ready! ${body}"
             return 0
         else
             retry_count=$((retry_count + 1))
             log_info "Waiting for server... (${retry_count}/${MAX_RETRIES})"
-            sleep $RETRY_INTERVAL
+            # curl exits 22 on an HTTP error: the server answered 503 after long-polling, no need to sleep
+            if [ $curl_status -ne 22 ]; then
+                sleep $RETRY_INTERVAL
+            fi
         fi
     done
 
-    log_error "Server failed to start within $(($MAX_RETRIES * $RETRY_INTERVAL)) seconds"
+    log_error "Server failed to become ready after ${MAX_RETRIES} attempts"
 
     # Get server logs for debugging
     log_info "Fetching server logs for debugging..."
@@ -31,6 +31,7 @@ check_client() {
 check_server() {
     local server_running=false
     local port_open=false
+    local model_ready=false
 
     # Check if server tmux session exists
     if ssh "${SERVER_USER}@${SERVER_HOST}" "tmux has-session -t ${SERVER_SESSION} 2>/dev/null"; then
@@ -42,9 +43,17 @@ check_server() {
         port_open=true
     fi
 
-    if [ "$server_running" = true ] && [ "$port_open" = true ]; then
+    # Check if the model is loaded and warmed up
+    if curl -sf --max-time 5 "http://${SERVER_HOST}:${SERVER_PORT}/ready" >/dev/null 2>&1; then
+        model_ready=true
+    fi
+
+    if [ "$server_running" = true ] && [ "$model_ready" = true ]; then
         echo -e "  ${GREEN}✓${NC} Server running (${SERVER_HOST}:${SERVER_PORT})"
         return 0
+    elif [ "$server_running" = true ] && [ "$port_open" = true ]; then
+        echo -e "  ${YELLOW}⚠${NC} Server up but model not ready yet (loading or warming up)"
+        return 1
     elif [ "$server_running" = true ]; then
         echo -e "  ${YELLOW}⚠${NC} Server session exists but port not accessible"
         return 1
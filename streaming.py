@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Streaming transcription sessions
+Rolling audio buffer per WebSocket connection with local-agreement commit policy
+"""
+
+import re
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+from sessions import PROMPT_MAX_CHARS
+
+SAMPLE_RATE = 16000
+
+def normalize_word(word: str) -> str:
+    """Compare words case- and punctuation-insensitively"""
+    return re.sub(r"[^\w']", "", word.lower())
+
+class LocalAgreement:
+    """Commits the longest word prefix on which two consecutive hypotheses agree"""
+    def __init__(self):
+        self.previous: List[str] = []
+        self.committed = 0  # words of the current buffer's hypothesis already committed
+
+    def update(self, words: List[str]) -> List[str]:
+        """Feed a new hypothesis for the buffer; returns the newly committed words"""
+        agreed = self.committed
+        limit = min(len(words), len(self.previous))
+        while agreed < limit and normalize_word(words[agreed]) == normalize_word(self.previous[agreed]):
+            agreed += 1
+
+        new_words = words[self.committed:agreed]
+        self.committed = agreed
+        self.previous = words
+        return new_words
+
+    def drop(self, count: int):
+        """Forget the first count words once their audio has been trimmed from the buffer"""
+        self.previous = self.previous[count:]
+        self.committed = max(0, self.committed - count)
+
+class StreamingSession:
+    def __init__(self, decode_interval: float = 1.0, max_buffer_seconds: float = 20.0):
+        self.decode_interval = decode_interval
+        self.max_buffer_seconds = max_buffer_seconds
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.buffer_offset = 0.0  # session time of buffer[0], in seconds
+        self.new_samples = 0
+        self.agreement = LocalAgreement()
+        self.committed: List[str] = []
+        self.language = None
+
+    def add_audio(self, pcm: bytes):
+        """Append raw 16 kHz mono s16le PCM to the rolling buffer"""
+        pcm = pcm[:len(pcm) - len(pcm) % 2]
+        samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+        self.buffer = np.concatenate([self.buffer, samples])
+        self.new_samples += len(samples)
+
+    def ready(self) -> bool:
+        """Enough new audio has arrived to be worth re-decoding the buffer"""
+        return self.new_samples >= self.decode_interval * SAMPLE_RATE
+
+    def snapshot(self) -> np.ndarray:
+        """Copy of the buffer to decode; resets the new-audio counter"""
+        self.new_samples = 0
+        return self.buffer.copy()
+
+    def settled_language(self) -> Optional[str]:
+        """The detected language once words have been committed in it, so later decodes can skip detection"""
+        return self.language if self.committed else None
+
+    def context(self) -> Optional[str]:
+        """Committed text whose audio has been trimmed from the buffer, to prompt the next decode with"""
+        before_buffer = self.committed[:len(self.committed) - self.agreement.committed]
+        return " ".join(before_buffer)[-PROMPT_MAX_CHARS:] or None
+
+    def drop_silence(self, keep_seconds: float = 0.5):
+        """Discard an all-silent buffer, keeping a short tail so the next word's onset survives"""
+        self.new_samples = 0
+        keep = int(keep_seconds * SAMPLE_RATE)
+        if len(self.buffer) > keep:
+            self.buffer_offset += (len(self.buffer) - keep) / SAMPLE_RATE
+            self.buffer = self.buffer[-keep:]
+        # Whatever the last hypothesis said belonged to audio that is gone now
+        self.agreement = LocalAgreement()
+
+    def apply(self, result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Run local agreement on a fresh hypothesis for the buffer and build the messages to send"""
+        self.language = result.get("language") or self.language
+        segments = result.get("segments", [])
+        words = result.get("text", "").split()
+
+        messages = []
+        new_words = self.agreement.update(words)
+        if new_words:
+            self.committed.extend(new_words)
+            messages.append({"type": "commit", "text": " ".join(new_words), "language": self.language})
+
+        messages.append({
+            "type": "partial",
+            "committed": " ".join(self.committed),
+            "text": " ".join(words[self.agreement.committed:]),
+            "language": self.language
+        })
+
+        self.trim(segments)
+        return messages
+
+    def trim(self, segments: List[Dict[str, Any]]):
+        """Drop buffered audio whose words are all committed once the buffer grows too long"""
+        if len(self.buffer) < self.max_buffer_seconds * SAMPLE_RATE:
+            return
+
+        cut_time, cut_words = self.committed_boundary(segments)
+        if cut_time <= 0:
+            # No segment is fully committed yet; commit what we have rather than grow without bound
+            remaining = self.agreement.previous[self.agreement.committed:]
+            self.committed.extend(remaining)
+            cut_time, cut_words = len(self.buffer) / SAMPLE_RATE, len(self.agreement.previous)
+
+        cut = min(int(cut_time * SAMPLE_RATE), len(self.buffer))
+        self.buffer = self.buffer[cut:]
+        self.buffer_offset += cut / SAMPLE_RATE
+        self.agreement.drop(cut_words)
+
+    def committed_boundary(self, segments: List[Dict[str, Any]]) -> Tuple[float, int]:
+        """End time and word count of the last segment whose words are all committed"""
+        cut_time, cut_words, words = 0.0, 0, 0
+        for segment in segments:
+            words += len(segment["text"].split())
+            if words > self.agreement.committed:
+                break
+            cut_time, cut_words = segment["end"], words
+        return cut_time, cut_words
+
+    def finish(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Commit everything in the final hypothesis and summarize the session"""
+        self.language = result.get("language") or self.language
+        words = result.get("text", "").split()
+        tail = words[self.agreement.committed:]
+        self.committed.extend(tail)
+        return {
+            "type": "final",
+            "text": " ".join(self.committed),
+            "tail": " ".join(tail),
+            "language": self.language,
+            "duration": round(self.buffer_offset + len(self.buffer) / SAMPLE_RATE, 2)
+        }
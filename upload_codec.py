@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Compressed uploads for the clients
+Recordings are encoded by ffmpeg while capturing, as FLAC (lossless) or Opus (lossy), if the server can decode them
+"""
+
+import mimetypes
+import os
+import subprocess
+import requests
+
+# Codec recordings are uploaded in: wav, flac or opus
+UPLOAD_CODEC = os.environ.get("VTT_UPLOAD_CODEC", "flac")
+# Opus bitrate; 24k keeps 16 kHz speech transparent for Whisper at a tenth of the WAV size
+OPUS_BITRATE = os.environ.get("VTT_OPUS_BITRATE", "24k")
+
+# codec -> (file suffix, upload content type, ffmpeg output arguments)
+CODECS = {
+    "wav": (".wav", "audio/wav", []),
+    "flac": (".flac", "audio/flac", ["-c:a", "flac"]),
+    "opus": (".ogg", "audio/ogg", ["-c:a", "libopus", "-b:a", OPUS_BITRATE, "-application", "voip"]),
+}
+
+def negotiate_codec(server_url: str, wanted: str = UPLOAD_CODEC) -> str:
+    """The wanted codec if the server advertises it on /codecs, WAV otherwise"""
+    if wanted == "wav":
+        return wanted
+    if wanted not in CODECS:
+        print(f"⚠️  Unknown upload codec '{wanted}', sending WAV")
+        return "wav"
+    try:
+        response = requests.get(f"{server_url}/codecs", timeout=5)
+        supported = response.json().get("codecs", {}) if response.status_code == 200 else {}
+    except (requests.exceptions.RequestException, ValueError):
+        supported = {}
+    if wanted not in supported:
+        print(f"⚠️  Server can't decode {wanted} uploads, sending WAV")
+        return "wav"
+    print(f"🗜️  Uploading {wanted}" + (f" at {OPUS_BITRATE}" if wanted == "opus" else ""))
+    return wanted
+
+def suffix(codec: str) -> str:
+    """Recording file suffix for a codec"""
+    return CODECS[codec][0]
+
+def ffmpeg_output_args(codec: str) -> list:
+    """ffmpeg arguments (before the output file) that encode a recording in this codec"""
+    return CODECS[codec][2]
+
+def content_type(path: str) -> str:
+    """Upload content type for an audio file, from its extension"""
+    extension = os.path.splitext(path)[1].lower()
+    for codec_suffix, codec_type, _ in CODECS.values():
+        if extension == codec_suffix:
+            return codec_type
+    guessed = mimetypes.guess_type(path)[0]
+    return guessed if guessed and guessed.startswith("audio/") else "audio/wav"
+
+def encode_file(path: str, codec: str) -> str:
+    """Re-encode a WAV recording for upload; returns the new file (the original is removed), or path on failure"""
+    if codec == "wav":
+        return path
+    encoded = os.path.splitext(path)[0] + suffix(codec)
+    cmd = ['ffmpeg', '-i', path, '-ar', '16000', '-ac', '1', *ffmpeg_output_args(codec), '-y', encoded]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return path
+    os.unlink(path)
+    return encoded
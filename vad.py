@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Lightweight voice activity detection
+Frame energy plus zero-crossing rate, cheap enough to run on CPU before every transcription
+"""
+
+import numpy as np
+from typing import List, Tuple
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+
+# A frame counts as speech when it is this far above the clip's noise floor...
+NOISE_MARGIN_DB = 10.0
+# ...but anything louder than SPEECH_DB always counts and anything quieter than SILENCE_DB never does
+SPEECH_DB = -35.0
+SILENCE_DB = -55.0
+# Broadband hiss crosses zero far more often than voiced speech
+MAX_ZERO_CROSSING_RATE = 0.45
+
+class VadResult:
+    def __init__(self, speech: np.ndarray, frame_samples: int, total_samples: int):
+        self.speech = speech  # per-frame speech mask
+        self.frame_samples = frame_samples
+        self.total_samples = total_samples
+
+    @property
+    def has_speech(self) -> bool:
+        return bool(self.speech.any())
+
+    @property
+    def speech_ratio(self) -> float:
+        return float(self.speech.mean()) if len(self.speech) else 0.0
+
+    def bounds(self, padding_ms: float = 200) -> Tuple[int, int]:
+        """First and last speech sample, widened by padding_ms on each side"""
+        if not self.has_speech:
+            return 0, 0
+        frames = np.flatnonzero(self.speech)
+        padding = int(padding_ms * SAMPLE_RATE / 1000)
+        start = max(0, frames[0] * self.frame_samples - padding)
+        end = min(self.total_samples, (frames[-1] + 1) * self.frame_samples + padding)
+        return start, end
+
+def frame_features(audio: np.ndarray, frame_samples: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-frame energy in dBFS and zero-crossing rate"""
+    n_frames = len(audio) // frame_samples
+    frames = audio[:n_frames * frame_samples].reshape(n_frames, frame_samples)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1) + 1e-12)
+    energy_db = 20 * np.log10(rms + 1e-12)
+    signs = np.signbit(frames)
+    zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+    return energy_db, zcr
+
+def remove_short_runs(mask: np.ndarray, value: bool, min_frames: int) -> np.ndarray:
+    """Flip runs of value shorter than min_frames"""
+    mask = mask.copy()
+    run_start = None
+    for i in range(len(mask) + 1):
+        if i < len(mask) and mask[i] == value:
+            if run_start is None:
+                run_start = i
+        elif run_start is not None:
+            if i - run_start < min_frames:
+                mask[run_start:i] = not value
+            run_start = None
+    return mask
+
+def detect_speech(audio: np.ndarray, min_speech_ms: float = 250, hangover_ms: float = 300) -> VadResult:
+    """Classify 30 ms frames as speech or silence"""
+    frame_samples = SAMPLE_RATE * FRAME_MS // 1000
+    if len(audio) < frame_samples:
+        return VadResult(np.zeros(0, dtype=bool), frame_samples, len(audio))
+
+    energy_db, zcr = frame_features(audio, frame_samples)
+    noise_floor = np.percentile(energy_db, 10)
+    threshold = min(max(noise_floor + NOISE_MARGIN_DB, SILENCE_DB), SPEECH_DB)
+    speech = (energy_db > threshold) & (zcr < MAX_ZERO_CROSSING_RATE)
+
+    # Bridge short pauses between words, then drop isolated clicks
+    speech = remove_short_runs(speech, False, max(1, int(hangover_ms / FRAME_MS)))
+    speech = remove_short_runs(speech, True, max(1, int(min_speech_ms / FRAME_MS)))
+    return VadResult(speech, frame_samples, len(audio))
+
+def trim_silence(audio: np.ndarray, padding_ms: float = 200,
+                 min_speech_ms: float = 250) -> Tuple[np.ndarray, float, VadResult]:
+    """Cut leading and trailing silence; returns the trimmed audio, its offset in seconds and the VAD result"""
+    vad = detect_speech(audio, min_speech_ms)
+    if not vad.has_speech:
+        return audio[:0], 0.0, vad
+    start, end = vad.bounds(padding_ms)
+    return audio[start:end], start / SAMPLE_RATE, vad
+
+def split_at_silence(audio: np.ndarray, max_seconds: float = 30.0, min_speech_ms: float = 250,
+                     drop_silent: bool = True) -> List[Tuple[int, int]]:
+    """Cut audio into (start, end) sample ranges of at most max_seconds, cutting in the middle of pauses"""
+    frame_samples = SAMPLE_RATE * FRAME_MS // 1000
+    max_samples = int(max_seconds * SAMPLE_RATE)
+    vad = detect_speech(audio, min_speech_ms)
+    if len(audio) <= max_samples or len(vad.speech) == 0:
+        return [(0, len(audio))]
+    energy_db, _ = frame_features(audio, frame_samples)
+
+    chunks = []
+    start = 0
+    while len(audio) - start > max_samples:
+        # Only look at the second half of the window so no chunk ends up much shorter than the limit
+        lo = (start + max_samples // 2) // frame_samples
+        hi = (start + max_samples) // frame_samples
+        pauses = np.flatnonzero(~vad.speech[lo:hi])
+        if len(pauses):
+            # Middle of the last pause in the window
+            run_end = pauses[-1]
+            run_start = run_end
+            while run_start > 0 and not vad.speech[lo + run_start - 1]:
+                run_start -= 1
+            cut_frame = lo + (run_start + run_end + 1) // 2
+        else:
+            # Continuous speech: fall back to the quietest frame, the latest one on ties
+            cut_frame = hi - 1 - int(np.argmin(energy_db[lo:hi][::-1]))
+        end = max(start + 1, min(int(cut_frame) * frame_samples, start + max_samples))
+        chunks.append((start, end))
+        start = end
+    chunks.append((start, len(audio)))
+
+    if drop_silent:
+        voiced = [(s, e) for s, e in chunks if vad.speech[s // frame_samples:-(-e // frame_samples)].any()]
+        # On an already-trimmed clip the noise floor is higher, so quiet speech can vanish here; never return nothing
+        return voiced or chunks
+    return chunks
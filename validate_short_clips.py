@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Accuracy check for the short-clip fast path (VTT_SHORT_CLIP_SECONDS)
+Transcribes a WAV corpus through both the padded 30 s window and the truncated window, and reports word error rate and encoder speedup
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+from typing import Any, Dict, List, Optional
+
+import torch
+import whisper
+from whisper.audio import HOP_LENGTH, SAMPLE_RATE
+
+from audio_decode import decode_audio
+from cpu_inference import configure_threads, quantize_int8
+from inference import short_window_frames, transcribe_batch
+
+def normalize(text: str) -> List[str]:
+    """Lowercase words without punctuation, so WER counts wording rather than formatting"""
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Word-level edit distance divided by the reference length"""
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / len(ref)
+
+def reference_text(path: str) -> Optional[str]:
+    """Transcript stored next to a clip as <name>.txt, if any"""
+    try:
+        with open(os.path.splitext(path)[0] + ".txt") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def transcribe(model: whisper.Whisper, audio, short_clip_seconds: float) -> Dict[str, Any]:
+    timings: List[Dict[str, float]] = [{}]
+    result = transcribe_batch(model, [audio], timings=timings, short_clip_seconds=short_clip_seconds)[0]
+    return {"text": result["text"].strip(), "encoder_ms": timings[0].get("encoder", 0.0) * 1000,
+            "total_ms": sum(timings[0].values()) * 1000}
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the short-clip fast path with the padded 30 s window")
+    parser.add_argument("corpus", help="Directory of audio clips (*.wav); optional <name>.txt reference transcripts")
+    parser.add_argument("--model", default="tiny", help="Whisper model (default: tiny)")
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--cpu-mode", choices=("int8", "fp32"), default=os.getenv("VTT_CPU_MODE", "int8"),
+                        help="Same meaning as the server's VTT_CPU_MODE (default: int8)")
+    parser.add_argument("--max-seconds", type=float, default=float(os.getenv("VTT_SHORT_CLIP_SECONDS") or 10),
+                        help="Fast path cutoff to validate (default: VTT_SHORT_CLIP_SECONDS, else 10)")
+    parser.add_argument("--max-wer", type=float, default=0.05,
+                        help="Fail if the fast path's WER against the padded path exceeds this (default: 0.05)")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.corpus, "*.wav")))
+    if not paths:
+        sys.exit(f"❌ No .wav files in {args.corpus}")
+
+    if args.device == "cpu":
+        configure_threads()
+    print(f"📥 Loading {args.model} on {args.device}...", file=sys.stderr)
+    model = whisper.load_model(args.model, device=args.device)
+    if args.device == "cpu" and args.cpu_mode == "int8":
+        model = quantize_int8(model)
+
+    clips = []
+    for path in paths:
+        with open(path, "rb") as f:
+            audio = decode_audio(f.read())
+        seconds = len(audio) / SAMPLE_RATE
+        if seconds > args.max_seconds:
+            continue
+        # Warm both window shapes first, so neither path is charged for kernel initialization
+        transcribe(model, audio, 0.0)
+        transcribe(model, audio, args.max_seconds)
+        padded = transcribe(model, audio, 0.0)
+        fast = transcribe(model, audio, args.max_seconds)
+        reference = reference_text(path)
+        clip = {
+            "clip": os.path.basename(path),
+            "seconds": round(seconds, 2),
+            "window_seconds": short_window_frames(len(audio)) * HOP_LENGTH / SAMPLE_RATE,
+            "padded_text": padded["text"],
+            "fast_text": fast["text"],
+            "wer_fast_vs_padded": round(word_error_rate(padded["text"], fast["text"]), 4),
+            "padded_encoder_ms": round(padded["encoder_ms"], 1),
+            "fast_encoder_ms": round(fast["encoder_ms"], 1),
+            "padded_total_ms": round(padded["total_ms"], 1),
+            "fast_total_ms": round(fast["total_ms"], 1),
+        }
+        if reference is not None:
+            clip["wer_padded_vs_reference"] = round(word_error_rate(reference, padded["text"]), 4)
+            clip["wer_fast_vs_reference"] = round(word_error_rate(reference, fast["text"]), 4)
+        clips.append(clip)
+        marker = "✅" if clip["wer_fast_vs_padded"] <= args.max_wer else "⚠️ "
+        print(f"{marker} {clip['clip']}: {seconds:.1f}s, WER {clip['wer_fast_vs_padded']:.3f}, encoder "
+              f"{clip['padded_encoder_ms']:.0f} → {clip['fast_encoder_ms']:.0f} ms", file=sys.stderr)
+
+    if not clips:
+        sys.exit(f"❌ No clips of at most {args.max_seconds:g}s in {args.corpus}")
+
+    def mean(key: str) -> Optional[float]:
+        values = [clip[key] for clip in clips if key in clip]
+        return round(sum(values) / len(values), 4) if values else None
+
+    summary = {
+        "model": args.model,
+        "device": args.device,
+        "max_seconds": args.max_seconds,
+        "clips": len(clips),
+        "identical_text": sum(clip["padded_text"] == clip["fast_text"] for clip in clips),
+        "wer_fast_vs_padded": mean("wer_fast_vs_padded"),
+        "wer_padded_vs_reference": mean("wer_padded_vs_reference"),
+        "wer_fast_vs_reference": mean("wer_fast_vs_reference"),
+        "encoder_speedup": round(mean("padded_encoder_ms") / max(mean("fast_encoder_ms"), 1e-6), 2),
+        "total_speedup": round(mean("padded_total_ms") / max(mean("fast_total_ms"), 1e-6), 2),
+    }
+    encoded = json.dumps({"summary": summary, "clips": clips}, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(encoded + "\n")
+    else:
+        print(encoded)
+
+    print(f"\n📊 {summary['clips']} clips: WER vs padded {summary['wer_fast_vs_padded']}, "
+          f"encoder {summary['encoder_speedup']}x, end to end {summary['total_speedup']}x faster", file=sys.stderr)
+    if summary["wer_fast_vs_padded"] > args.max_wer:
+        print(f"❌ Fast path WER above {args.max_wer}: keep VTT_SHORT_CLIP_SECONDS off or lower it", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()